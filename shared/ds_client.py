@@ -5,14 +5,375 @@ Version complète et corrigée
 """
 
 import requests
+import orjson
 import logging
-from datetime import datetime
-from typing import Dict, List, Any, Tuple, Optional
+import functools
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
+from typing import Dict, List, Any, Tuple, Optional, Iterator
+
+try:
+    import httpx  # Optionnel : HTTP/2 vers DS
+except ImportError:
+    httpx = None
 
 logger = logging.getLogger(__name__)
 
+# Requêtes GraphQL DS, définies une seule fois au chargement du module
+_Q_TEST = """
+query {
+    __schema {
+        queryType {
+            name
+        }
+    }
+}
+"""
+
+_Q_INSTRUCTEURS = """
+query getInstructeurs($demarcheNumber: Int!) {
+    demarche(number: $demarcheNumber) {
+        id
+        groupeInstructeurs {
+            id
+            label
+            instructeurs {
+                id
+                email
+            }
+        }
+    }
+}
+"""
+
+_Q_DOSSIERS = """
+query getDossiers($demarcheNumber: Int!, $first: Int, $after: String, $updatedSince: ISO8601DateTime) {
+    demarche(number: $demarcheNumber) {
+        id
+        dossiers(first: $first, after: $after, updatedSince: $updatedSince) {
+            pageInfo {
+                hasNextPage
+                endCursor
+            }
+            nodes {
+                id
+                number
+                state
+                dateDerniereModification
+            }
+        }
+    }
+}
+"""
+
+# Même pagination que _Q_DOSSIERS, avec les annotations privées de chaque dossier
+_Q_DOSSIERS_WITH_ANNOTATIONS = """
+query getDossiersWithAnnotations($demarcheNumber: Int!, $first: Int, $after: String, $updatedSince: ISO8601DateTime) {
+    demarche(number: $demarcheNumber) {
+        id
+        dossiers(first: $first, after: $after, updatedSince: $updatedSince) {
+            pageInfo {
+                hasNextPage
+                endCursor
+            }
+            nodes {
+                id
+                number
+                state
+                dateDerniereModification
+                annotations {
+                    id
+                    label
+                    stringValue
+                    __typename
+                }
+            }
+        }
+    }
+}
+"""
+
+_Q_DOSSIER_ANNOTATIONS = """
+query getDossier($dossierNumber: Int!) {
+    dossier(number: $dossierNumber) {
+        id
+        number
+        annotations {
+            id
+            label
+            champDescriptorId
+            stringValue
+            __typename
+        }
+    }
+}
+"""
+
+# Mutations : seuls l'id et les erreurs sont exploités par les appelants
+_M_UPDATE_TEXT = """
+mutation dossierModifierAnnotationText($input: DossierModifierAnnotationTextInput!) {
+    dossierModifierAnnotationText(input: $input) {
+        annotation {
+            id
+        }
+        errors {
+            message
+        }
+    }
+}
+"""
+
+_M_UPDATE_CHECKBOX = """
+mutation dossierModifierAnnotationCheckbox($input: DossierModifierAnnotationCheckboxInput!) {
+    dossierModifierAnnotationCheckbox(input: $input) {
+        annotation {
+            id
+        }
+        errors {
+            message
+        }
+    }
+}
+"""
+
+_M_UPDATE_DATE = """
+mutation dossierModifierAnnotationDate($input: DossierModifierAnnotationDateInput!) {
+    dossierModifierAnnotationDate(input: $input) {
+        annotation {
+            id
+        }
+        errors {
+            message
+        }
+    }
+}
+"""
+
+_M_UPDATE_DATETIME = """
+mutation dossierModifierAnnotationDatetime($input: DossierModifierAnnotationDatetimeInput!) {
+    dossierModifierAnnotationDatetime(input: $input) {
+        annotation {
+            id
+        }
+        errors {
+            message
+        }
+    }
+}
+"""
+
+_M_UPDATE_INTEGER_NUMBER = """
+mutation dossierModifierAnnotationIntegerNumber($input: DossierModifierAnnotationIntegerNumberInput!) {
+    dossierModifierAnnotationIntegerNumber(input: $input) {
+        annotation {
+            id
+        }
+        errors {
+            message
+        }
+    }
+}
+"""
+
+_M_UPDATE_DECIMAL_NUMBER = """
+mutation dossierModifierAnnotationDecimalNumber($input: DossierModifierAnnotationDecimalNumberInput!) {
+    dossierModifierAnnotationDecimalNumber(input: $input) {
+        annotation {
+            id
+        }
+        errors {
+            message
+        }
+    }
+}
+"""
+
+_M_UPDATE_DROPDOWN = """
+mutation dossierModifierAnnotationDropDownList($input: DossierModifierAnnotationDropDownListInput!) {
+    dossierModifierAnnotationDropDownList(input: $input) {
+        annotation {
+            id
+        }
+        errors {
+            message
+        }
+    }
+}
+"""
+
+_TEST_PAYLOAD = {'query': _Q_TEST}
+
+@functools.lru_cache(maxsize=64)
+def _ds_type(annotation_type: str) -> str:
+    """Normalise un type d'annotation DS (ex: 'ANNOTATION_DESCRIPTOR_TEXT' → 'text')"""
+    return annotation_type.lower().replace('annotation_descriptor_', '')
+
+# Erreurs attendues lors d'un appel à l'API DS (transport et décodage)
+_NETWORK_ERRORS = (requests.RequestException, orjson.JSONDecodeError) + ((httpx.HTTPError,) if httpx else ())
+
+def _error_snippet(response) -> str:
+    """Extrait le début du corps d'une réponse en erreur, sans détection d'encodage"""
+    return response.content[:512].decode('utf-8', errors='replace')
+
+# Convertisseurs de valeurs Grist → DS, un par type d'annotation
+_CHECKBOX_TRUE = frozenset({'true', '1', 'oui', 'yes', 'on'})
+
+def _fmt_checkbox(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in _CHECKBOX_TRUE
+
+def _fmt_number(value: Any) -> float:
+    return float(value)
+
+def _fmt_integer(value: Any) -> int:
+    return int(float(value))
+
+def _fmt_date(value: Any) -> Any:
+    if isinstance(value, str) and 'T' in value and not value.endswith('Z'):
+        return f"{value}Z"
+    return value
+
+def _fmt_datetime(value: Any) -> Any:
+    if isinstance(value, str) and not value.endswith('Z'):
+        if 'T' not in value:
+            return f"{value}T00:00:00.000Z"
+        return f"{value}Z"
+    return value
+
+def _fmt_text(value: Any) -> str:
+    return str(value)
+
+_FORMATTERS = {
+    'checkbox': _fmt_checkbox,
+    'number': _fmt_number,
+    'decimal_number': _fmt_number,
+    'integer_number': _fmt_integer,
+    'date': _fmt_date,
+    'datetime': _fmt_datetime,
+}
+
 class DSClient:
-    def __init__(self, token: str, instructeur_id: str):
+    # Mutations DS par type d'annotation : (nom de la mutation, préfixe clientMutationId, document)
+    _MUTATIONS = MappingProxyType({
+        'text': ('dossierModifierAnnotationText', 'update-text', _M_UPDATE_TEXT),
+        'textarea': ('dossierModifierAnnotationText', 'update-text', _M_UPDATE_TEXT),
+        'checkbox': ('dossierModifierAnnotationCheckbox', 'update-checkbox', _M_UPDATE_CHECKBOX),
+        'date': ('dossierModifierAnnotationDate', 'update-date', _M_UPDATE_DATE),
+        'datetime': ('dossierModifierAnnotationDatetime', 'update-datetime', _M_UPDATE_DATETIME),
+        'integer_number': ('dossierModifierAnnotationIntegerNumber', 'update-integer', _M_UPDATE_INTEGER_NUMBER),
+        'decimal_number': ('dossierModifierAnnotationDecimalNumber', 'update-decimal', _M_UPDATE_DECIMAL_NUMBER),
+        'drop_down_list': ('dossierModifierAnnotationDropDownList', 'update-dropdown', _M_UPDATE_DROPDOWN),
+    })
+    
+    # Conversion des __typename GraphQL en types normalisés
+    _TYPE_MAPPING = MappingProxyType({
+        'TextChamp': 'text',
+        'TextareaChamp': 'textarea',
+        'IntegerNumberChamp': 'integer_number',
+        'DecimalNumberChamp': 'decimal_number',
+        'CheckboxChamp': 'checkbox',
+        'DateChamp': 'date',
+        'DatetimeChamp': 'datetime',
+        'DropDownListChamp': 'drop_down_list',
+        # Fallbacks
+        'NumberChamp': 'decimal_number',
+    })
+    
+    # Compatibilité type Grist → type d'annotation DS
+    _COMPAT_MAP = MappingProxyType({
+        'Text': {
+            'text': 'compatible',
+            'textarea': 'compatible', 
+            'checkbox': 'needs_conversion',
+            'date': 'needs_conversion',
+            'datetime': 'needs_conversion',
+            'number': 'needs_conversion',
+            'integer_number': 'needs_conversion',
+            'decimal_number': 'needs_conversion',
+            'drop_down_list': 'compatible'
+        },
+        'Numeric': {
+            'text': 'compatible',
+            'textarea': 'compatible',
+            'number': 'compatible',
+            'integer_number': 'compatible',
+            'decimal_number': 'compatible',
+            'checkbox': 'incompatible',
+            'date': 'incompatible',
+            'datetime': 'incompatible',
+            'drop_down_list': 'needs_conversion'
+        },
+        'Int': {
+            'text': 'compatible',
+            'textarea': 'compatible',
+            'number': 'compatible',
+            'integer_number': 'compatible',
+            'decimal_number': 'compatible',
+            'checkbox': 'incompatible',
+            'date': 'incompatible',
+            'datetime': 'incompatible',
+            'drop_down_list': 'needs_conversion'
+        },
+        'Date': {
+            'text': 'compatible',
+            'textarea': 'compatible',
+            'date': 'compatible',
+            'datetime': 'compatible',
+            'checkbox': 'incompatible',
+            'number': 'incompatible',
+            'integer_number': 'incompatible',
+            'decimal_number': 'incompatible',
+            'drop_down_list': 'incompatible'
+        },
+        'DateTime': {
+            'text': 'compatible',
+            'textarea': 'compatible',
+            'date': 'needs_conversion',
+            'datetime': 'compatible',
+            'checkbox': 'incompatible',
+            'number': 'incompatible',
+            'integer_number': 'incompatible',
+            'decimal_number': 'incompatible',
+            'drop_down_list': 'incompatible'
+        },
+        'Bool': {
+            'text': 'compatible',
+            'textarea': 'compatible',
+            'checkbox': 'compatible',
+            'date': 'incompatible',
+            'datetime': 'incompatible',
+            'number': 'incompatible',
+            'integer_number': 'incompatible',
+            'decimal_number': 'incompatible',
+            'drop_down_list': 'needs_conversion'
+        }
+    })
+    
+    # Valeurs texte acceptées pour une checkbox
+    _CHECKBOX_VALID_TEXT = frozenset({'true', 'false', '1', '0', 'oui', 'non', 'yes', 'no'})
+    
+    # Types DS dont la compatibilité avec une colonne Grist Text dépend de la valeur
+    _VALUE_CHECKED_DS_TYPES = frozenset({'checkbox', 'number', 'integer_number', 'decimal_number'})
+    
+    # Politique de réessai du client HTTP/2, alignée sur celle de la session requests
+    _HTTP2_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    _HTTP2_MAX_RETRIES = 3
+    _HTTP2_BACKOFF = 0.5
+    
+    # Recouvrement des rafraîchissements incrémentaux du cache de dossiers (décalage d'horloge)
+    _DOSSIER_CACHE_OVERLAP = timedelta(minutes=5)
+    # Au-delà, le cache de dossiers est rechargé en entier (seul moyen d'en retirer les dossiers supprimés)
+    _DOSSIER_CACHE_FULL_REFRESH = timedelta(days=1)
+    
+    def __init__(self, token: str, instructeur_id: str, http2: bool = False, cache_path: Optional[str] = None):
         self.token = token
         self.instructeur_id = instructeur_id
         self.base_url = "https://www.demarches-simplifiees.fr/api/v2/graphql"
@@ -20,304 +381,330 @@ class DSClient:
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
+        
+        # Session partagée : keep-alive et pool de connexions vers DS
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Réessais automatiques sur erreurs transitoires, en respectant Retry-After (rate limit DS)
+        retry = Retry(
+            total=5,
+            connect=3,
+            read=3,
+            status=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['POST']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=32, max_retries=retry))
+        
+        # Valeurs actuelles des annotations : (dossier_id, annotation_id) → stringValue
+        self._current_values: Dict[Tuple[str, str], Any] = {}
+        
+        # Client HTTP/2 optionnel (multiplexage sur une seule connexion TLS), requests sinon
+        self.http_client = None
+        if http2:
+            if httpx is None:
+                logger.warning("httpx non installé - HTTP/2 désactivé, utilisation de requests")
+            else:
+                try:
+                    # Tous les workers partagent ce client : leurs requêtes sont multiplexées
+                    # en flux HTTP/2 sur une même connexion (réessais de connexion par le transport)
+                    self.http_client = httpx.Client(
+                        headers=self.headers,
+                        timeout=httpx.Timeout(30.0, connect=10.0),
+                        transport=httpx.HTTPTransport(
+                            http2=True,
+                            retries=3,
+                            limits=httpx.Limits(max_keepalive_connections=10, max_connections=10)
+                        )
+                    )
+                except ImportError:
+                    logger.warning("Paquet h2 absent - HTTP/2 désactivé, utilisation de requests")
+        
+        # Cache SQLite optionnel des dossiers (UUID + annotations), rafraîchi par updatedSince
+        self._cache = None
+        self._cache_lock = threading.Lock()
+        if cache_path:
+            self._cache = sqlite3.connect(cache_path, check_same_thread=False)
+            with self._cache_lock, self._cache:
+                self._cache.execute(
+                    "CREATE TABLE IF NOT EXISTS ds_dossiers ("
+                    "demarche_number INTEGER, number INTEGER, dossier BLOB, "
+                    "PRIMARY KEY (demarche_number, number))"
+                )
+                # Ancien format (sans date de chargement complet) : l'oublier force un rechargement complet
+                columns = [row[1] for row in self._cache.execute("PRAGMA table_info(ds_dossiers_fetch)")]
+                if columns and 'full_fetched_at' not in columns:
+                    self._cache.execute("DROP TABLE ds_dossiers_fetch")
+                self._cache.execute(
+                    "CREATE TABLE IF NOT EXISTS ds_dossiers_fetch ("
+                    "demarche_number INTEGER PRIMARY KEY, fetched_at TEXT, full_fetched_at TEXT)"
+                )
     
-    def test_connection(self) -> Tuple[bool, Any]:
-        """Test la connexion à DS avec une requête simple"""
+    def close(self):
+        """Ferme la session HTTP et libère le pool de connexions"""
+        self.session.close()
+        if self.http_client is not None:
+            self.http_client.close()
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _post(self, payload: Dict[str, Any], timeout: int = 30) -> Tuple[bool, Any]:
+        """Envoie une requête GraphQL à DS et décode la réponse JSON (orjson)
+        
+        Seules les erreurs réseau et de décodage sont interceptées ici, pour tous les appels DS.
+        """
+        body = orjson.dumps(payload)
         try:
-            query = """
-            query {
-                __schema {
-                    queryType {
-                        name
-                    }
-                }
-            }
-            """
-            response = requests.post(
-                self.base_url,
-                headers=self.headers,
-                json={'query': query},
-                timeout=10
-            )
-            
+            if self.http_client is not None:
+                response = self._post_http2(body, timeout)
+            else:
+                response = self.session.post(self.base_url, data=body, timeout=timeout)
             if response.status_code == 200:
-                data = response.json()
-                if 'errors' in data:
-                    return False, data['errors']
-                return True, "Connexion DS réussie"
-            return False, f"HTTP {response.status_code}: {response.text}"
-        except Exception as e:
-            logger.error(f"Erreur test connexion DS: {e}")
+                return True, orjson.loads(response.content)
+        except _NETWORK_ERRORS as e:
+            logger.error(f"Erreur requête DS: {e}")
             return False, str(e)
+        return False, f"HTTP {response.status_code}: {_error_snippet(response)}"
+    
+    def _post_http2(self, body: bytes, timeout: int):
+        """POST via le client HTTP/2, avec réessais sur 429/5xx en respectant Retry-After"""
+        for attempt in range(self._HTTP2_MAX_RETRIES + 1):
+            response = self.http_client.post(self.base_url, content=body, timeout=timeout)
+            if response.status_code not in self._HTTP2_RETRY_STATUSES or attempt == self._HTTP2_MAX_RETRIES:
+                return response
+            
+            retry_after = response.headers.get('Retry-After', '')
+            delay = float(retry_after) if retry_after.isdigit() else self._HTTP2_BACKOFF * (2 ** attempt)
+            logger.warning(f"DS HTTP {response.status_code}, nouvel essai dans {delay:.1f}s")
+            time.sleep(delay)
+    
+    def test_connection(self) -> Tuple[bool, Any]:
+        """Test la connexion à DS avec une requête simple"""
+        success, data = self._post(_TEST_PAYLOAD, timeout=10)
+        if not success:
+            return False, data
+        if 'errors' in data:
+            return False, data['errors']
+        return True, "Connexion DS réussie"
     
     def get_instructeurs(self, demarche_number: int) -> Tuple[bool, Any]:
         """Récupère les groupes d'instructeurs et leurs instructeurs pour une démarche"""
-        try:
-            query = """
-            query getInstructeurs($demarcheNumber: Int!) {
-                demarche(number: $demarcheNumber) {
-                    id
-                    number
-                    title
-                    groupeInstructeurs {
-                        id
-                        number
-                        label
-                        instructeurs {
-                            id
-                            email
-                        }
-                    }
-                }
-            }
-            """
-            response = requests.post(
-                self.base_url,
-                headers=self.headers,
-                json={
-                    'query': query,
-                    'variables': {'demarcheNumber': int(demarche_number)}
-                },
-                timeout=15
-            )
+        success, data = self._post({
+            'query': _Q_INSTRUCTEURS,
+            'variables': {'demarcheNumber': int(demarche_number)}
+        }, timeout=15)
+        if not success:
+            return False, data
 
-            if response.status_code == 200:
-                data = response.json()
-                if 'errors' in data:
-                    return False, data['errors']
-                if not data['data']['demarche']:
-                    return False, "Démarche non trouvée"
-
-                groupe_instructeurs = data['data']['demarche']['groupeInstructeurs']
-
-                # Extraire tous les instructeurs uniques
-                instructeurs_map = {}
-                for groupe in groupe_instructeurs:
-                    for instructeur in groupe['instructeurs']:
-                        instructeur_id = instructeur['id']
-                        if instructeur_id not in instructeurs_map:
-                            instructeurs_map[instructeur_id] = {
-                                'id': instructeur_id,
-                                'email': instructeur['email'],
-                                'groupes': []
-                            }
-                        instructeurs_map[instructeur_id]['groupes'].append({
-                            'id': groupe['id'],
-                            'label': groupe['label']
-                        })
-
-                instructeurs_list = list(instructeurs_map.values())
-                logger.info(f"Instructeurs récupérés: {len(instructeurs_list)}")
-                return True, instructeurs_list
-            return False, f"HTTP {response.status_code}: {response.text}"
-        except Exception as e:
-            logger.error(f"Erreur récupération instructeurs: {e}")
-            return False, str(e)
+        if 'errors' in data:
+            return False, data['errors']
+        if not data['data']['demarche']:
+            return False, "Démarche non trouvée"
 
-    def get_dossiers(self, demarche_number: int, limit: int = 50) -> Tuple[bool, Any]:
-        """Récupère les dossiers d'une démarche par son numéro"""
-        try:
-            query = """
-            query getDossiers($demarcheNumber: Int!, $first: Int) {
-                demarche(number: $demarcheNumber) {
-                    id
-                    number
-                    title
-                    dossiers(first: $first) {
-                        nodes {
-                            id
-                            number
-                            state
-                            dateDerniereModification
-                            annotations {
-                                id
-                                label
-                                champDescriptorId
-                                stringValue
-                            }
-                        }
-                    }
-                }
-            }
-            """
-            response = requests.post(
-                self.base_url,
-                headers=self.headers,
-                json={
-                    'query': query,
-                    'variables': {'demarcheNumber': int(demarche_number), 'first': limit}
-                },
-                timeout=30
-            )
+        groupe_instructeurs = data['data']['demarche']['groupeInstructeurs']
 
-            if response.status_code == 200:
-                data = response.json()
-                if 'errors' in data:
-                    return False, data['errors']
-                if not data['data']['demarche']:
-                    return False, "Démarche non trouvée"
-
-                dossiers = data['data']['demarche']['dossiers']['nodes']
-                logger.info(f"Dossiers récupérés: {len(dossiers)}")
-                return True, dossiers
-            return False, f"HTTP {response.status_code}: {response.text}"
-        except Exception as e:
-            logger.error(f"Erreur récupération dossiers: {e}")
-            return False, str(e)
-    
-    def get_dossier_annotations(self, dossier_number: int) -> Tuple[bool, Any]:
-        """Récupère les annotations d'un dossier par son numéro avec détection automatique des types"""
-        try:
-            query = """
-            query getDossier($dossierNumber: Int!) {
-                dossier(number: $dossierNumber) {
-                    id
-                    number
-                    annotations {
-                        id
-                        label
-                        champDescriptorId
-                        stringValue
-                        __typename
-                    }
-                }
-            }
-            """
+        # Extraire tous les instructeurs uniques en une seule passe
+        groupes_by_instructeur = defaultdict(list)
+        emails = {}
+        for groupe in groupe_instructeurs:
+            groupe_info = {'id': groupe['id'], 'label': groupe['label']}
+            for instructeur in groupe['instructeurs']:
+                groupes_by_instructeur[instructeur['id']].append(groupe_info)
+                emails[instructeur['id']] = instructeur['email']
+
+        instructeurs_list = [
+            {'id': instructeur_id, 'email': emails[instructeur_id], 'groupes': groupes}
+            for instructeur_id, groupes in groupes_by_instructeur.items()
+        ]
+        logger.info(f"Instructeurs récupérés: {len(instructeurs_list)}")
+        return True, instructeurs_list
+
+    def iter_dossiers(self, demarche_number: int, since: Optional[datetime] = None, page_size: int = 100, with_annotations: bool = False) -> Iterator[Tuple[bool, Any]]:
+        """Parcourt les dossiers d'une démarche page par page (pagination par curseur)
+        
+        Produit (True, dossiers_de_la_page) pour chaque page, ou (False, erreur) puis s'arrête.
+        Si since est fourni, seuls les dossiers modifiés depuis cette date sont renvoyés.
+        Avec with_annotations, chaque dossier porte ses annotations typées (voir get_dossier_annotations).
+        """
+        query = _Q_DOSSIERS_WITH_ANNOTATIONS if with_annotations else _Q_DOSSIERS
+        variables = {
+            'demarcheNumber': int(demarche_number),
+            'first': page_size,
+            'after': None,
+            'updatedSince': since.isoformat() if since else None
+        }
+        
+        while True:
+            success, data = self._post({'query': query, 'variables': variables}, timeout=30)
+            if not success:
+                yield False, data
+                return
+            if 'errors' in data:
+                yield False, data['errors']
+                return
+            if not data['data']['demarche']:
+                yield False, "Démarche non trouvée"
+                return
             
-            response = requests.post(
-                self.base_url,
-                headers=self.headers,
-                json={
-                    'query': query,
-                    'variables': {'dossierNumber': int(dossier_number)}
-                },
-                timeout=15
-            )
+            dossiers = data['data']['demarche']['dossiers']
+            if with_annotations:
+                for dossier in dossiers['nodes']:
+                    self._type_annotations(dossier['id'], dossier['annotations'])
+            yield True, dossiers['nodes']
             
-            if response.status_code == 200:
-                data = response.json()
-                if 'errors' in data:
-                    logger.error(f"Erreurs GraphQL: {data['errors']}")
-                    return False, data['errors']
-                if not data['data']['dossier']:
-                    return False, "Dossier non trouvé"
-                
-                annotations = data['data']['dossier']['annotations']
-                
-                # Enrichir chaque annotation avec son type normalisé depuis __typename
-                for annotation in annotations:
-                    typename = annotation.get('__typename', 'TextChamp')
-                    annotation['ds_type'] = self._normalize_annotation_type(typename)
-                
-                return True, annotations
+            if not dossiers['pageInfo']['hasNextPage']:
+                return
+            variables['after'] = dossiers['pageInfo']['endCursor']
+
+    def get_dossiers(self, demarche_number: int, limit: Optional[int] = 50, since: Optional[datetime] = None, with_annotations: bool = False) -> Tuple[bool, Any]:
+        """Récupère les dossiers d'une démarche par son numéro (limit=None pour tous les dossiers)"""
+        page_size = min(limit, 100) if limit else 100
+        dossiers = []
+        
+        for success, page in self.iter_dossiers(demarche_number, since=since, page_size=page_size, with_annotations=with_annotations):
+            if not success:
+                return False, page
+            dossiers.extend(page)
+            if limit and len(dossiers) >= limit:
+                dossiers = dossiers[:limit]
+                break
+        
+        logger.info(f"Dossiers récupérés: {len(dossiers)}")
+        return True, dossiers
+    
+    def get_dossiers_with_annotations(self, demarche_number: int, limit: Optional[int] = 50, since: Optional[datetime] = None) -> Tuple[bool, Any]:
+        """Récupère les dossiers d'une démarche avec leurs annotations typées, en une requête par page"""
+        return self.get_dossiers(demarche_number, limit=limit, since=since, with_annotations=True)
+    
+    def get_cached_dossiers_with_annotations(self, demarche_number: int, limit: Optional[int] = 50) -> Tuple[bool, Any]:
+        """Comme get_dossiers_with_annotations, en s'appuyant sur le cache SQLite s'il est configuré
+        
+        Avec le cache, limit ne s'applique pas : le cache doit contenir tous les dossiers de la démarche.
+        Il est chargé en entier au premier appel puis toutes les _DOSSIER_CACHE_FULL_REFRESH (ce qui
+        en retire les dossiers supprimés ou archivés) ; entre-temps, seuls les dossiers modifiés depuis
+        le dernier chargement sont demandés à DS, y compris par nos propres mises à jour d'annotations.
+        """
+        if self._cache is None:
+            return self.get_dossiers_with_annotations(demarche_number, limit=limit)
+        
+        demarche_number = int(demarche_number)
+        fetched_at, full_fetched_at, cached = self._load_cached_dossiers(demarche_number)
+        started_at = datetime.now(timezone.utc)
+        
+        full = full_fetched_at is None or started_at - full_fetched_at >= self._DOSSIER_CACHE_FULL_REFRESH
+        if full:
+            success, dossiers = self.get_dossiers_with_annotations(demarche_number, limit=None)
+            cached = {}
+        else:
+            success, dossiers = self.get_dossiers_with_annotations(demarche_number, limit=None, since=fetched_at - self._DOSSIER_CACHE_OVERLAP)
+        if not success:
+            return False, dossiers
+        
+        # Les dossiers du cache n'ont pas été relus : mémoriser aussi leurs valeurs actuelles
+        for dossier in cached.values():
+            self._type_annotations(dossier['id'], dossier['annotations'])
+        for dossier in dossiers:
+            cached[dossier['number']] = dossier
+        
+        self._store_dossiers(demarche_number, dossiers, started_at, full)
+        logger.info(f"Dossiers en cache: {len(cached)} ({len(dossiers)} {'chargés en entier' if full else 'rechargés'} depuis DS)")
+        return True, list(cached.values())
+    
+    def _load_cached_dossiers(self, demarche_number: int) -> Tuple[Optional[datetime], Optional[datetime], Dict[int, Dict[str, Any]]]:
+        """Dates du dernier chargement et du dernier chargement complet, et dossiers en cache d'une démarche"""
+        with self._cache_lock:
+            row = self._cache.execute(
+                "SELECT fetched_at, full_fetched_at FROM ds_dossiers_fetch WHERE demarche_number = ?", (demarche_number,)
+            ).fetchone()
+            if row is None or row[1] is None:
+                return None, None, {}
+            rows = self._cache.execute(
+                "SELECT number, dossier FROM ds_dossiers WHERE demarche_number = ?", (demarche_number,)
+            ).fetchall()
+        return (datetime.fromisoformat(row[0]), datetime.fromisoformat(row[1]),
+                {number: orjson.loads(dossier) for number, dossier in rows})
+    
+    def _store_dossiers(self, demarche_number: int, dossiers: List[Dict[str, Any]], fetched_at: datetime, full: bool):
+        """Enregistre les dossiers chargés et la date de chargement (un chargement complet remplace le cache)"""
+        with self._cache_lock, self._cache:
+            if full:
+                self._cache.execute("DELETE FROM ds_dossiers WHERE demarche_number = ?", (demarche_number,))
+            self._cache.executemany(
+                "INSERT OR REPLACE INTO ds_dossiers (demarche_number, number, dossier) VALUES (?, ?, ?)",
+                [(demarche_number, dossier['number'], orjson.dumps(dossier)) for dossier in dossiers]
+            )
+            if full:
+                self._cache.execute(
+                    "INSERT OR REPLACE INTO ds_dossiers_fetch (demarche_number, fetched_at, full_fetched_at) VALUES (?, ?, ?)",
+                    (demarche_number, fetched_at.isoformat(), fetched_at.isoformat())
+                )
             else:
-                return False, f"HTTP {response.status_code}: {response.text}"
-        except Exception as e:
-            logger.error(f"Erreur récupération annotations: {e}")
-            return False, str(e)
+                self._cache.execute(
+                    "UPDATE ds_dossiers_fetch SET fetched_at = ? WHERE demarche_number = ?",
+                    (fetched_at.isoformat(), demarche_number)
+                )
     
-    def _normalize_annotation_type(self, typename: str) -> str:
-        """Convertit les __typename GraphQL en types normalisés"""
-        type_mapping = {
-            'TextChamp': 'text',
-            'TextareaChamp': 'textarea', 
-            'IntegerNumberChamp': 'integer_number',
-            'DecimalNumberChamp': 'decimal_number',
-            'CheckboxChamp': 'checkbox',
-            'DateChamp': 'date',
-            'DatetimeChamp': 'datetime',
-            'DropDownListChamp': 'drop_down_list',
-            # Fallbacks
-            'NumberChamp': 'decimal_number',
-        }
+    def get_dossier_annotations(self, dossier_number: int) -> Tuple[bool, Any]:
+        """Récupère les annotations d'un dossier par son numéro avec détection automatique des types"""
+        success, data = self._post({
+            'query': _Q_DOSSIER_ANNOTATIONS,
+            'variables': {'dossierNumber': int(dossier_number)}
+        }, timeout=15)
+        if not success:
+            return False, data
         
-        return type_mapping.get(typename, 'text')
+        if 'errors' in data:
+            logger.error(f"Erreurs GraphQL: {data['errors']}")
+            return False, data['errors']
+        if not data['data']['dossier']:
+            return False, "Dossier non trouvé"
+        
+        dossier = data['data']['dossier']
+        return True, self._type_annotations(dossier['id'], dossier['annotations'])
+    
+    def _type_annotations(self, dossier_id: str, annotations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Enrichit chaque annotation avec son type normalisé depuis __typename et mémorise sa valeur"""
+        type_for = self._TYPE_MAPPING.get
+        current_values = self._current_values
+        for annotation in annotations:
+            annotation['ds_type'] = type_for(annotation.get('__typename', 'TextChamp'), 'text')
+            # Mémoriser la valeur actuelle pour éviter les mises à jour sans effet
+            current_values[(dossier_id, annotation['id'])] = annotation.get('stringValue')
+        return annotations
     
     def get_annotation_types(self, demarche_number: int) -> Tuple[bool, Any]:
         """DÉSACTIVÉ - Les types sont maintenant récupérés via __typename dans get_dossier_annotations"""
         logger.info("get_annotation_types désactivé - utilisation de __typename")
         return True, []
     
+    def schema_compatibility(self, grist_type: str, ds_annotation_type: str) -> Optional[str]:
+        """Compatibilité déduite des seuls types, ou None si elle dépend aussi de la valeur"""
+        ds_type_normalized = _ds_type(ds_annotation_type)
+        if grist_type == 'Text' and ds_type_normalized in self._VALUE_CHECKED_DS_TYPES:
+            return None
+        return self._COMPAT_MAP.get(grist_type, {}).get(ds_type_normalized, 'incompatible')
+    
     def check_compatibility(self, grist_type: str, ds_annotation_type: str, grist_value: Any = None) -> str:
         """Vérifie la compatibilité entre un type Grist et un type DS"""
-        compatibility_map = {
-            'Text': {
-                'text': 'compatible',
-                'textarea': 'compatible', 
-                'checkbox': 'needs_conversion',
-                'date': 'needs_conversion',
-                'datetime': 'needs_conversion',
-                'number': 'needs_conversion',
-                'integer_number': 'needs_conversion',
-                'decimal_number': 'needs_conversion',
-                'drop_down_list': 'compatible'
-            },
-            'Numeric': {
-                'text': 'compatible',
-                'textarea': 'compatible',
-                'number': 'compatible',
-                'integer_number': 'compatible',
-                'decimal_number': 'compatible',
-                'checkbox': 'incompatible',
-                'date': 'incompatible',
-                'datetime': 'incompatible',
-                'drop_down_list': 'needs_conversion'
-            },
-            'Int': {
-                'text': 'compatible',
-                'textarea': 'compatible',
-                'number': 'compatible',
-                'integer_number': 'compatible',
-                'decimal_number': 'compatible',
-                'checkbox': 'incompatible',
-                'date': 'incompatible',
-                'datetime': 'incompatible',
-                'drop_down_list': 'needs_conversion'
-            },
-            'Date': {
-                'text': 'compatible',
-                'textarea': 'compatible',
-                'date': 'compatible',
-                'datetime': 'compatible',
-                'checkbox': 'incompatible',
-                'number': 'incompatible',
-                'integer_number': 'incompatible',
-                'decimal_number': 'incompatible',
-                'drop_down_list': 'incompatible'
-            },
-            'DateTime': {
-                'text': 'compatible',
-                'textarea': 'compatible',
-                'date': 'needs_conversion',
-                'datetime': 'compatible',
-                'checkbox': 'incompatible',
-                'number': 'incompatible',
-                'integer_number': 'incompatible',
-                'decimal_number': 'incompatible',
-                'drop_down_list': 'incompatible'
-            },
-            'Bool': {
-                'text': 'compatible',
-                'textarea': 'compatible',
-                'checkbox': 'compatible',
-                'date': 'incompatible',
-                'datetime': 'incompatible',
-                'number': 'incompatible',
-                'integer_number': 'incompatible',
-                'decimal_number': 'incompatible',
-                'drop_down_list': 'needs_conversion'
-            }
-        }
-        
-        ds_type_normalized = ds_annotation_type.lower().replace('annotation_descriptor_', '')
+        ds_type_normalized = _ds_type(ds_annotation_type)
         
-        if grist_type in compatibility_map:
-            compatibility = compatibility_map[grist_type].get(ds_type_normalized, 'incompatible')
+        if grist_type in self._COMPAT_MAP:
+            compatibility = self._COMPAT_MAP[grist_type].get(ds_type_normalized, 'incompatible')
             
             # Vérifications spéciales avec la valeur
             if grist_value is not None:
                 if ds_type_normalized == 'checkbox' and grist_type == 'Text':
-                    if str(grist_value).lower() in ['true', 'false', '1', '0', 'oui', 'non', 'yes', 'no']:
+                    if str(grist_value).lower() in self._CHECKBOX_VALID_TEXT:
                         compatibility = 'compatible'
                     else:
                         compatibility = 'incompatible'
@@ -342,349 +729,190 @@ class DSClient:
         if value is None or value == '':
             return None
             
-        ds_type = ds_annotation_type.lower().replace('annotation_descriptor_', '')
+        ds_type = _ds_type(ds_annotation_type)
         
         try:
-            if ds_type == 'checkbox':
-                if isinstance(value, bool):
-                    return value
-                str_val = str(value).lower()
-                return str_val in ['true', '1', 'oui', 'yes', 'on']
-            
-            elif ds_type in ['number', 'decimal_number']:
-                return float(value)
-                
-            elif ds_type == 'integer_number':
-                return int(float(value))
-                
-            elif ds_type in ['date', 'datetime']:
-                if isinstance(value, str) and not value.endswith('Z'):
-                    if 'T' not in value:
-                        if ds_type == 'datetime':
-                            value = f"{value}T00:00:00.000Z"
-                    elif not value.endswith('Z'):
-                        value = f"{value}Z"
-                return value
-            
-            else:  # text, textarea, drop_down_list
-                return str(value)
-                
+            # text, textarea, drop_down_list → _fmt_text
+            return _FORMATTERS.get(ds_type, _fmt_text)(value)
         except (ValueError, TypeError) as e:
             logger.error(f"Erreur formatage valeur {value} pour type {ds_type}: {e}")
             return str(value)
     
     def _execute_mutation(self, mutation: str, variables: dict) -> Tuple[bool, Any]:
         """Exécute une mutation GraphQL"""
+        success, data = self._post({'query': mutation, 'variables': variables}, timeout=30)
+        if not success:
+            return False, data
+        if 'errors' in data:
+            return False, data['errors']
+        return True, data
+    
+    def clear_current_values(self):
+        """Oublie les valeurs d'annotations mémorisées (à appeler avant de recharger les dossiers)"""
+        self._current_values.clear()
+    
+    def is_unchanged(self, dossier_id: str, annotation_id: str, value: Any, ds_type: str) -> bool:
+        """Indique si la valeur correspond déjà à la valeur connue de l'annotation dans DS"""
+        current = self._current_values.get((dossier_id, annotation_id))
+        if current is None or current == '':
+            return False
+        
+        # Normaliser les deux côtés avec le même convertisseur (checkbox, nombres, dates)
+        formatter = _FORMATTERS.get(ds_type, _fmt_text)
         try:
-            response = requests.post(
-                self.base_url,
-                headers=self.headers,
-                json={'query': mutation, 'variables': variables},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'errors' in data:
-                    return False, data['errors']
-                return True, data
-            return False, f"HTTP {response.status_code}: {response.text}"
-        except Exception as e:
-            logger.error(f"Erreur exécution mutation: {e}")
-            return False, str(e)
+            return formatter(current) == formatter(value)
+        except (ValueError, TypeError):
+            return False
     
-    def update_annotation_text(self, dossier_id: str, annotation_id: str, value: Any) -> Tuple[bool, Any]:
-        """Met à jour une annotation texte"""
-        mutation = """
-        mutation dossierModifierAnnotationText($input: DossierModifierAnnotationTextInput!) {
-            dossierModifierAnnotationText(input: $input) {
-                annotation {
-                    id
-                    label
-                    stringValue
-                    updatedAt
-                }
-                errors {
-                    message
-                }
-            }
-        }
+    def _mutation_value(self, ds_type: str, value: Any) -> Any:
+        """Formate la valeur attendue par l'input de la mutation DS"""
+        if ds_type in ['checkbox', 'integer_number', 'decimal_number']:
+            return self.format_value_for_ds(value, ds_type)
+        if ds_type in ['date', 'datetime']:
+            return str(self.format_value_for_ds(value, ds_type))
+        return str(value)
+    
+    def update_annotations_bulk(self, dossier_id: str, updates: List[Dict[str, Any]]) -> Tuple[bool, Any]:
+        """Met à jour plusieurs annotations d'un dossier en une seule requête GraphQL
+        
+        Chaque update est un dict {'annotation_id', 'value', 'ds_type'}.
+        Retourne la liste des (succès, résultat) dans l'ordre des updates.
         """
+        results = [None] * len(updates)
+        declarations = []
+        selections = []
+        variables = {}
+        aliases = {}
         
-        variables = {
-            "input": {
-                "annotationId": annotation_id,
-                "clientMutationId": f"update-text-{annotation_id}",
+        for index, update in enumerate(updates):
+            value = update['value']
+            if not value and value != False:
+                results[index] = (True, "Valeur vide ignorée")
+                continue
+            
+            ds_type = _ds_type(update.get('ds_type', 'text'))
+            if self.is_unchanged(dossier_id, update['annotation_id'], value, ds_type):
+                results[index] = (True, "Valeur inchangée")
+                continue
+            if ds_type not in self._MUTATIONS:
+                logger.warning(f"Type d'annotation non reconnu: {ds_type}, utilisation de text")
+                ds_type = 'text'
+            mutation_name, client_prefix, _ = self._MUTATIONS[ds_type]
+            
+            alias = f"a{index}"
+            aliases[alias] = index
+            declarations.append(f"$i{index}: {mutation_name[0].upper()}{mutation_name[1:]}Input!")
+            selections.append(f"{alias}: {mutation_name}(input: $i{index}) {{ annotation {{ id }} errors {{ message }} }}")
+            variables[f"i{index}"] = {
+                "annotationId": update['annotation_id'],
+                "clientMutationId": f"{client_prefix}-{update['annotation_id']}",
                 "dossierId": dossier_id,
                 "instructeurId": self.instructeur_id,
-                "value": str(value)
+                "value": self._mutation_value(ds_type, value)
             }
-        }
         
+        if not aliases:
+            return True, results
+        
+        mutation = f"mutation dossierModifierAnnotations({', '.join(declarations)}) {{ {' '.join(selections)} }}"
         success, data = self._execute_mutation(mutation, variables)
-        if success:
-            result = data['data']['dossierModifierAnnotationText']
+        
+        for alias, index in aliases.items():
+            if not success:
+                results[index] = (False, data)
+                continue
+            result = data['data'][alias]
             if result['errors']:
-                return False, result['errors']
-            return True, result['annotation']
-        return False, data
-    
-    def update_annotation_checkbox(self, dossier_id: str, annotation_id: str, value: Any) -> Tuple[bool, Any]:
-        """Met à jour une annotation checkbox"""
-        mutation = """
-        mutation dossierModifierAnnotationCheckbox($input: DossierModifierAnnotationCheckboxInput!) {
-            dossierModifierAnnotationCheckbox(input: $input) {
-                annotation {
-                    id
-                    label
-                    stringValue
-                    updatedAt
-                }
-                errors {
-                    message
-                }
-            }
-        }
-        """
+                results[index] = (False, result['errors'])
+            else:
+                results[index] = (True, result['annotation'])
+                self._current_values[(dossier_id, updates[index]['annotation_id'])] = updates[index]['value']
         
-        bool_value = self.format_value_for_ds(value, 'checkbox')
+        return all(ok for ok, _ in results), results
+    
+    def _update(self, ds_type: str, dossier_id: str, annotation_id: str, value: Any) -> Tuple[bool, Any]:
+        """Met à jour une annotation avec la mutation précompilée correspondant à son type"""
+        mutation_name, client_prefix, mutation = self._MUTATIONS[ds_type]
         
         variables = {
             "input": {
                 "annotationId": annotation_id,
-                "clientMutationId": f"update-checkbox-{annotation_id}",
+                "clientMutationId": f"{client_prefix}-{annotation_id}",
                 "dossierId": dossier_id,
                 "instructeurId": self.instructeur_id,
-                "value": bool_value
+                "value": self._mutation_value(ds_type, value)
             }
         }
         
         success, data = self._execute_mutation(mutation, variables)
         if success:
-            result = data['data']['dossierModifierAnnotationCheckbox']
+            result = data['data'][mutation_name]
             if result['errors']:
                 return False, result['errors']
             return True, result['annotation']
         return False, data
     
+    def update_annotation_text(self, dossier_id: str, annotation_id: str, value: Any) -> Tuple[bool, Any]:
+        """Met à jour une annotation texte"""
+        return self._update('text', dossier_id, annotation_id, value)
+    
+    def update_annotation_checkbox(self, dossier_id: str, annotation_id: str, value: Any) -> Tuple[bool, Any]:
+        """Met à jour une annotation checkbox"""
+        return self._update('checkbox', dossier_id, annotation_id, value)
+    
     def update_annotation_date(self, dossier_id: str, annotation_id: str, value: Any) -> Tuple[bool, Any]:
         """Met à jour une annotation date"""
-        mutation = """
-        mutation dossierModifierAnnotationDate($input: DossierModifierAnnotationDateInput!) {
-            dossierModifierAnnotationDate(input: $input) {
-                annotation {
-                    id
-                    label
-                    stringValue
-                    updatedAt
-                }
-                errors {
-                    message
-                }
-            }
-        }
-        """
-        
-        formatted_value = self.format_value_for_ds(value, 'date')
-        
-        variables = {
-            "input": {
-                "annotationId": annotation_id,
-                "clientMutationId": f"update-date-{annotation_id}",
-                "dossierId": dossier_id,
-                "instructeurId": self.instructeur_id,
-                "value": str(formatted_value)
-            }
-        }
-        
-        success, data = self._execute_mutation(mutation, variables)
-        if success:
-            result = data['data']['dossierModifierAnnotationDate']
-            if result['errors']:
-                return False, result['errors']
-            return True, result['annotation']
-        return False, data
+        return self._update('date', dossier_id, annotation_id, value)
     
     def update_annotation_datetime(self, dossier_id: str, annotation_id: str, value: Any) -> Tuple[bool, Any]:
         """Met à jour une annotation datetime"""
-        mutation = """
-        mutation dossierModifierAnnotationDatetime($input: DossierModifierAnnotationDatetimeInput!) {
-            dossierModifierAnnotationDatetime(input: $input) {
-                annotation {
-                    id
-                    label
-                    stringValue
-                    updatedAt
-                }
-                errors {
-                    message
-                }
-            }
-        }
-        """
-        
-        formatted_value = self.format_value_for_ds(value, 'datetime')
-        
-        variables = {
-            "input": {
-                "annotationId": annotation_id,
-                "clientMutationId": f"update-datetime-{annotation_id}",
-                "dossierId": dossier_id,
-                "instructeurId": self.instructeur_id,
-                "value": str(formatted_value)
-            }
-        }
-        
-        success, data = self._execute_mutation(mutation, variables)
-        if success:
-            result = data['data']['dossierModifierAnnotationDatetime']
-            if result['errors']:
-                return False, result['errors']
-            return True, result['annotation']
-        return False, data
+        return self._update('datetime', dossier_id, annotation_id, value)
     
     def update_annotation_integer_number(self, dossier_id: str, annotation_id: str, value: Any) -> Tuple[bool, Any]:
         """Met à jour une annotation nombre entier"""
-        try:
-            mutation = """
-            mutation dossierModifierAnnotationIntegerNumber($input: DossierModifierAnnotationIntegerNumberInput!) {
-                dossierModifierAnnotationIntegerNumber(input: $input) {
-                    annotation {
-                        id
-                        label
-                        stringValue
-                        updatedAt
-                    }
-                    errors {
-                        message
-                    }
-                }
-            }
-            """
-            
-            int_value = self.format_value_for_ds(value, 'integer_number')
-            
-            variables = {
-                "input": {
-                    "annotationId": annotation_id,
-                    "clientMutationId": f"update-integer-{annotation_id}",
-                    "dossierId": dossier_id,
-                    "instructeurId": self.instructeur_id,
-                    "value": int_value
-                }
-            }
-            
-            success, data = self._execute_mutation(mutation, variables)
-            if success:
-                result = data['data']['dossierModifierAnnotationIntegerNumber']
-                if result['errors']:
-                    return False, result['errors']
-                return True, result['annotation']
-            return False, data
-        except Exception as e:
-            logger.error(f"Exception mise à jour annotation integer: {e}")
-            return False, str(e)
+        return self._update('integer_number', dossier_id, annotation_id, value)
     
     def update_annotation_decimal_number(self, dossier_id: str, annotation_id: str, value: Any) -> Tuple[bool, Any]:
         """Met à jour une annotation nombre décimal"""
-        mutation = """
-        mutation dossierModifierAnnotationDecimalNumber($input: DossierModifierAnnotationDecimalNumberInput!) {
-            dossierModifierAnnotationDecimalNumber(input: $input) {
-                annotation {
-                    id
-                    label
-                    stringValue
-                    updatedAt
-                }
-                errors {
-                    message
-                }
-            }
-        }
-        """
-        
-        decimal_value = self.format_value_for_ds(value, 'decimal_number')
-        
-        variables = {
-            "input": {
-                "annotationId": annotation_id,
-                "clientMutationId": f"update-decimal-{annotation_id}",
-                "dossierId": dossier_id,
-                "instructeurId": self.instructeur_id,
-                "value": decimal_value
-            }
-        }
-        
-        success, data = self._execute_mutation(mutation, variables)
-        if success:
-            result = data['data']['dossierModifierAnnotationDecimalNumber']
-            if result['errors']:
-                return False, result['errors']
-            return True, result['annotation']
-        return False, data
+        return self._update('decimal_number', dossier_id, annotation_id, value)
     
     def update_annotation_dropdown(self, dossier_id: str, annotation_id: str, value: Any) -> Tuple[bool, Any]:
         """Met à jour une annotation liste déroulante"""
-        mutation = """
-        mutation dossierModifierAnnotationDropDownList($input: DossierModifierAnnotationDropDownListInput!) {
-            dossierModifierAnnotationDropDownList(input: $input) {
-                annotation {
-                    id
-                    label
-                    stringValue
-                    updatedAt
-                }
-                errors {
-                    message
-                }
-            }
-        }
-        """
-        
-        variables = {
-            "input": {
-                "annotationId": annotation_id,
-                "clientMutationId": f"update-dropdown-{annotation_id}",
-                "dossierId": dossier_id,
-                "instructeurId": self.instructeur_id,
-                "value": str(value)
-            }
-        }
-        
-        success, data = self._execute_mutation(mutation, variables)
-        if success:
-            result = data['data']['dossierModifierAnnotationDropDownList']
-            if result['errors']:
-                return False, result['errors']
-            return True, result['annotation']
-        return False, data
+        return self._update('drop_down_list', dossier_id, annotation_id, value)
     
     def update_annotation_by_type(self, dossier_id: str, annotation_id: str, value: Any, annotation_type: str, grist_type: str = None) -> Tuple[bool, Any]:
         """Met à jour une annotation en utilisant la bonne mutation selon le type"""
         if not value and value != False:
             return True, "Valeur vide ignorée"
         
-        ds_type = annotation_type.lower().replace('annotation_descriptor_', '')
+        ds_type = _ds_type(annotation_type)
         
-        try:
-            if ds_type in ['text', 'textarea']:
-                return self.update_annotation_text(dossier_id, annotation_id, value)
-            elif ds_type == 'checkbox':
-                return self.update_annotation_checkbox(dossier_id, annotation_id, value)
-            elif ds_type == 'date':
-                return self.update_annotation_date(dossier_id, annotation_id, value)
-            elif ds_type == 'datetime':
-                return self.update_annotation_datetime(dossier_id, annotation_id, value)
-            elif ds_type == 'integer_number':
-                return self.update_annotation_integer_number(dossier_id, annotation_id, value)
-            elif ds_type == 'decimal_number':
-                return self.update_annotation_decimal_number(dossier_id, annotation_id, value)
-            elif ds_type == 'drop_down_list':
-                return self.update_annotation_dropdown(dossier_id, annotation_id, value)
-            else:
-                logger.warning(f"Type d'annotation non reconnu: {ds_type}, utilisation de text")
-                return self.update_annotation_text(dossier_id, annotation_id, str(value))
-                
-        except Exception as e:
-            logger.error(f"Erreur mise à jour annotation {annotation_id}: {e}")
-            return False, str(e)
+        if self.is_unchanged(dossier_id, annotation_id, value, ds_type):
+            return True, "Valeur inchangée"
+        
+        if ds_type not in self._MUTATIONS:
+            logger.warning(f"Type d'annotation non reconnu: {ds_type}, utilisation de text")
+            ds_type = 'text'
+        
+        success, result = self._update(ds_type, dossier_id, annotation_id, value)
+        
+        if success:
+            self._current_values[(dossier_id, annotation_id)] = value
+        return success, result
+            
+    
+    def update_many(self, updates: List[Tuple], max_workers: int = 10) -> List[Tuple[bool, Any]]:
+        """Met à jour plusieurs annotations en parallèle (concurrence bornée)
+        
+        Chaque élément de updates est un tuple (dossier_id, annotation_id, value, annotation_type[, grist_type]).
+        Les résultats sont renvoyés dans l'ordre des updates.
+        """
+        if not updates:
+            return []
+        
+        if max_workers <= 1 or len(updates) == 1:
+            # En série, dans le thread appelant
+            return [self.update_annotation_by_type(*update) for update in updates]
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(updates))) as executor:
+            return list(executor.map(lambda update: self.update_annotation_by_type(*update), updates))
@@ -6,139 +6,448 @@ Version améliorée avec détection des modifications
 
 import requests
 import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
 import hashlib
+import itertools
 import json
+import orjson
 from datetime import datetime
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Tuple, Optional, Iterator, Sequence, Generator
+
+try:
+    import ijson  # Optionnel : lecture incrémentale des grosses tables
+except ImportError:
+    ijson = None
+
+try:
+    import httpx  # Optionnel : HTTP/2 vers Grist
+except ImportError:
+    httpx = None
+
+# Erreurs de transport interceptées par GristClient._request ; les autres exceptions remontent
+_NETWORK_ERRORS = (requests.RequestException,) + ((httpx.HTTPError,) if httpx else ())
 
 logger = logging.getLogger(__name__)
 
+def _parse_json(response) -> Any:
+    """Décode le corps JSON d'une réponse avec orjson (lève ValueError si invalide)"""
+    return orjson.loads(response.content)
+
+class SyncStatusBuffer:
+    """Accumule des mises à jour (record_id, fields) et les envoie par lots
+    
+    Le lot part dès que max_batch_size éléments sont en attente ou, si
+    batch_interval_ms est fourni, quand le lot en attente est plus ancien
+    que cet intervalle. flush() envoie ce qui reste.
+    """
+    
+    def __init__(self, client: 'GristClient', table_id: str, max_batch_size: int = 50, batch_interval_ms: Optional[int] = None):
+        self.client = client
+        self.table_id = table_id
+        self.max_batch_size = max_batch_size
+        self.batch_interval_ms = batch_interval_ms
+        self._pending: List[Dict[str, Any]] = []
+        self._first_queued_at = 0.0
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    def add(self, record_id: int, fields: Dict[str, Any]) -> Tuple[bool, Any]:
+        """Ajoute une mise à jour au lot, l'envoie si un seuil est atteint"""
+        if not self._pending:
+            self._first_queued_at = time.monotonic()
+        self._pending.append({"id": record_id, "fields": fields})
+        
+        if len(self._pending) >= self.max_batch_size:
+            return self.flush()
+        if self.batch_interval_ms is not None and (time.monotonic() - self._first_queued_at) * 1000 >= self.batch_interval_ms:
+            return self.flush()
+        return True, None
+    
+    def flush(self) -> Tuple[bool, Any]:
+        """Envoie les mises à jour en attente en une seule requête"""
+        if not self._pending:
+            return True, None
+        
+        batch, self._pending = self._pending, []
+        success, result = self.client.bulk_update_records(self.table_id, batch)
+        if success:
+            self.client._remember_sync_hashes(self.table_id, batch)
+        else:
+            logger.error(f"Échec envoi lot de {len(batch)} statuts ({self.table_id}): {result}")
+        return success, result
+
+class BackgroundStatusWriter:
+    """Envoie les statuts de synchronisation depuis un thread dédié, par lots
+    
+    put() ne bloque pas l'appelant. Un lot part dès qu'il atteint max_batch_size,
+    ou quand son plus ancien statut attend depuis max_delay_ms. close() envoie le reste.
+    """
+    
+    def __init__(self, client: 'GristClient', table_id: str, max_batch_size: int = 200, max_delay_ms: int = 2000):
+        self.client = client
+        self.table_id = table_id
+        self.max_batch_size = max_batch_size
+        self.max_delay_ms = max_delay_ms
+        self.errors: List[str] = []
+        self._queue: 'queue.Queue[Optional[Tuple[int, Dict[str, Any]]]]' = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"grist-status-{table_id}", daemon=True)
+        self._thread.start()
+    
+    def put(self, record_id: int, success: bool, message: str = "", data_hash: str = None):
+        """Met en file le statut d'un enregistrement (horodaté maintenant)"""
+        self._queue.put((record_id, self.client._sync_status_fields(success, message, data_hash=data_hash)))
+    
+    def close(self) -> Tuple[bool, Any]:
+        """Envoie les statuts restants et arrête le thread"""
+        self._queue.put(None)
+        self._thread.join()
+        if self.errors:
+            return False, "; ".join(self.errors)
+        return True, None
+    
+    def _run(self):
+        buffer = SyncStatusBuffer(self.client, self.table_id, max_batch_size=self.max_batch_size)
+        while True:
+            # Attendre au plus le temps restant avant l'échéance du lot en cours
+            timeout = None
+            if len(buffer):
+                timeout = max(0.0, buffer._first_queued_at + self.max_delay_ms / 1000 - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._send(buffer.flush)
+                continue
+            
+            if item is None:
+                self._send(buffer.flush)
+                return
+            self._send(buffer.add, *item)
+    
+    def _send(self, operation, *args):
+        try:
+            success, result = operation(*args)
+        except Exception as e:
+            success, result = False, str(e)
+        if not success:
+            self.errors.append(str(result))
+
 class GristClient:
-    def __init__(self, base_url: str, token: str, doc_id: str):
+    # Statuts pour lesquels un enregistrement doit être (re)synchronisé
+    _PENDING_STATUSES = (None, "", "error", "pending")
+    # Réponses de records gardées pour les requêtes conditionnelles (les moins récentes sont oubliées)
+    _RECORDS_CACHE_SIZE = 16
+    
+    def __init__(self, base_url: str, token: str, doc_id: str, http2: bool = False, cache_path: Optional[str] = None):
         self.base_url = base_url
         self.token = token
         self.doc_id = doc_id
+        # En-têtes posés une fois sur la session (et le client HTTP/2), jamais par requête
         self.headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
+        
+        # Session partagée : keep-alive et pool de connexions vers Grist.
+        # Accept-Encoding est propre à chaque transport : urllib3 annonce ce qu'il sait décoder
+        # (gzip/deflate, plus br/zstd si les décodeurs sont installés) ; httpx pose son propre
+        # en-tête par défaut, limité à ses décodeurs (pas de zstd avec httpx 0.25).
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+        # Réessais automatiques sur erreurs transitoires et limitation de débit (Retry-After respecté).
+        # Réponse perdue ou 5xx : seules les méthodes idempotentes (GET, PATCH par id) sont rejouées,
+        # un POST ou un DELETE déjà traité par Grist ne doit pas l'être (lignes en double).
+        # Les erreurs de connexion (requête jamais partie) sont réessayées pour toutes les méthodes.
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'PATCH']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # Métadonnées des colonnes par table : {table_id: {col_id: col}}
+        self._columns_cache: Dict[str, Dict[str, dict]] = {}
+        
+        # Requêtes conditionnelles sur les records : {(table_id, limit): (ETag, corps JSON brut)}, LRU borné.
+        # Le corps est gardé en bytes et décodé à chaque usage : les appelants modifient les records reçus
+        self._records_cache: 'OrderedDict[Tuple[str, Optional[int]], Tuple[str, bytes]]' = OrderedDict()
+        self._records_cache_lock = threading.Lock()
+        
+        # GET identiques en cours, partagés entre threads : {(path, params): Future}
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self._inflight_lock = threading.Lock()
+        
+        # Client HTTP/2 optionnel (httpx) : multiplexe les requêtes sur une seule connexion
+        self.http_client = None
+        if http2:
+            if httpx is None:
+                logger.warning("httpx non installé - HTTP/2 désactivé, utilisation de requests")
+            else:
+                try:
+                    self.http_client = httpx.Client(
+                        http2=True,
+                        headers=self.headers,
+                        timeout=httpx.Timeout(30.0, connect=10.0),
+                        limits=httpx.Limits(max_keepalive_connections=20, max_connections=20)
+                    )
+                except ImportError:
+                    logger.warning("Paquet h2 absent - HTTP/2 désactivé, utilisation de requests")
+        
+        # Cache SQLite optionnel des derniers hash synchronisés : évite de dépendre de sync_hash côté Grist
+        self._cache = None
+        self._cache_lock = threading.Lock()
+        if cache_path:
+            self._cache = sqlite3.connect(cache_path, check_same_thread=False)
+            with self._cache_lock, self._cache:
+                self._cache.execute(
+                    "CREATE TABLE IF NOT EXISTS sync_cache ("
+                    "doc_id TEXT, table_id TEXT, record_id INTEGER, hash TEXT, synced_at TEXT, "
+                    "PRIMARY KEY (doc_id, table_id, record_id))"
+                )
     
-    def test_connection(self) -> Tuple[bool, Any]:
-        """Test la connexion à Grist"""
+    def close(self):
+        """Ferme la session HTTP et libère le pool de connexions"""
+        self.session.close()
+        if self.http_client is not None:
+            self.http_client.close()
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+    
+    def _load_sync_hashes(self, table_id: str) -> Dict[int, str]:
+        """Charge en une requête les derniers hash synchronisés d'une table depuis le cache local"""
+        if self._cache is None:
+            return {}
+        with self._cache_lock:
+            rows = self._cache.execute(
+                "SELECT record_id, hash FROM sync_cache WHERE doc_id = ? AND table_id = ?",
+                (self.doc_id, table_id)
+            ).fetchall()
+        return dict(rows)
+    
+    def _remember_sync_hashes(self, table_id: str, updates: List[Dict[str, Any]]):
+        """Enregistre dans le cache local les hash des synchronisations réussies"""
+        if self._cache is None:
+            return
+        rows = [
+            (self.doc_id, table_id, update['id'], update['fields']['sync_hash'], update['fields'].get('sync_date'))
+            for update in updates
+            if update['fields'].get('sync_status') == 'success' and update['fields'].get('sync_hash')
+        ]
+        if not rows:
+            return
+        with self._cache_lock, self._cache:
+            self._cache.executemany(
+                "INSERT OR REPLACE INTO sync_cache (doc_id, table_id, record_id, hash, synced_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+    
+    def _send(self, method: str, url: str, **kwargs):
+        """Envoie une requête via httpx (HTTP/2) si activé, sinon via la session requests
+        
+        Un corps json= est sérialisé avec orjson et envoyé en octets (Content-Type posé sur la session).
+        """
+        body = kwargs.pop('json', None)
+        if self.http_client is not None:
+            if body is not None:
+                kwargs['content'] = orjson.dumps(body)
+            return self.http_client.request(method, url, **kwargs)
+        if body is not None:
+            kwargs['data'] = orjson.dumps(body)
+        return self.session.request(method, url, **kwargs)
+    
+    def _request(self, method: str, path: str, action: str, cache_key: Optional[Tuple[str, Optional[int]]] = None, **kwargs) -> Tuple[bool, Any]:
+        """Envoie une requête à l'API du document et renvoie (succès, JSON décodé ou message d'erreur)
+        
+        Seules les erreurs réseau et les réponses non-JSON sont interceptées ici, pour tous les appels Grist.
+        Avec cache_key, la requête est conditionnelle (If-None-Match) et un 304 renvoie la réponse en cache.
+        Les GET identiques lancés en parallèle depuis plusieurs threads partagent une seule requête HTTP ;
+        chacun reçoit son propre décodage de la réponse (les appelants modifient les records reçus).
+        """
+        if method != 'GET':
+            return self._do_request(method, path, action, cache_key, **kwargs)[:2]
+        
+        key = (path, repr(sorted((kwargs.get('params') or {}).items())))
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        
+        if not owner:
+            success, data, body = future.result()
+            if success and body is not None:
+                data = orjson.loads(body)
+            return success, data
+        
         try:
-            url = f"{self.base_url}/docs/{self.doc_id}"
-            response = requests.get(url, headers=self.headers, timeout=10)
-            
+            result = self._do_request(method, path, action, cache_key, **kwargs)
+            future.set_result(result)
+            return result[:2]
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+    
+    def _do_request(self, method: str, path: str, action: str, cache_key: Optional[Tuple[str, Optional[int]]] = None, **kwargs) -> Tuple[bool, Any, Optional[bytes]]:
+        """Exécute la requête pour _request (sans regroupement)
+        
+        Renvoie (succès, JSON décodé ou message d'erreur, corps JSON brut ou None).
+        """
+        url = f"{self.base_url}/docs/{self.doc_id}{path}"
+        cached = None
+        if cache_key is not None:
+            with self._records_cache_lock:
+                cached = self._records_cache.get(cache_key)
+                if cached is not None:
+                    self._records_cache.move_to_end(cache_key)
+            if cached is not None:
+                kwargs['headers'] = {'If-None-Match': cached[0]}
+        
+        try:
+            response = self._send(method, url, **kwargs)
+            if response.status_code == 304 and cached is not None:
+                logger.debug(f"{action} : inchangé (304), données en cache réutilisées")
+                return True, orjson.loads(cached[1]), cached[1]
             if response.status_code == 200:
-                try:
-                    json_data = response.json()
-                    return True, json_data
-                except ValueError as e:
-                    logger.error(f"Erreur JSON parse: {e}")
-                    return False, f"Réponse non-JSON: {response.text[:200]}"
-            else:
-                logger.error(f"Status code: {response.status_code}, Text: {response.text[:500]}")
-                return False, f"HTTP {response.status_code}: {response.text[:200]}"
-        except Exception as e:
-            logger.error(f"Erreur test connexion Grist: {e}")
-            return False, str(e)
+                data = _parse_json(response)
+                etag = response.headers.get('ETag') if cache_key is not None else None
+                if etag:
+                    with self._records_cache_lock:
+                        self._records_cache[cache_key] = (etag, response.content)
+                        self._records_cache.move_to_end(cache_key)
+                        while len(self._records_cache) > self._RECORDS_CACHE_SIZE:
+                            self._records_cache.popitem(last=False)
+                return True, data, response.content
+        except _NETWORK_ERRORS as e:
+            logger.error(f"Erreur Grist ({action}): {e}")
+            return False, str(e), None
+        except ValueError as e:
+            logger.error(f"Erreur JSON parse ({action}): {e}")
+            return False, f"Réponse non-JSON: {response.text[:200]}", None
+        
+        logger.error(f"Erreur Grist ({action}) - Status: {response.status_code}, Text: {response.text[:500]}")
+        return False, f"HTTP {response.status_code}: {response.text[:200]}", None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def test_connection(self) -> Tuple[bool, Any]:
+        """Test la connexion à Grist"""
+        return self._request('GET', '', "test connexion", timeout=10)
     
     def get_tables(self) -> Tuple[bool, Any]:
         """Récupère la liste des tables"""
-        try:
-            url = f"{self.base_url}/docs/{self.doc_id}/tables"
-            response = requests.get(url, headers=self.headers, timeout=10)
-            
-            if response.status_code == 200:
-                try:
-                    json_data = response.json()
-                    return True, json_data
-                except ValueError as e:
-                    logger.error(f"Erreur JSON parse tables: {e}")
-                    return False, f"Réponse non-JSON: {response.text[:200]}"
-            else:
-                logger.error(f"Get tables error - Status: {response.status_code}")
-                return False, f"HTTP {response.status_code}: {response.text[:200]}"
-        except Exception as e:
-            logger.error(f"Erreur récupération tables: {e}")
-            return False, str(e)
+        return self._request('GET', '/tables', "récupération tables", timeout=10)
     
     def get_table_columns(self, table_id: str) -> Tuple[bool, Any]:
-        """Récupère les colonnes d'une table"""
-        try:
-            url = f"{self.base_url}/docs/{self.doc_id}/tables/{table_id}/columns"
-            response = requests.get(url, headers=self.headers, timeout=10)
-            
-            if response.status_code == 200:
-                try:
-                    json_data = response.json()
-                    return True, json_data
-                except ValueError as e:
-                    logger.error(f"Erreur JSON parse columns: {e}")
-                    return False, f"Réponse non-JSON: {response.text[:200]}"
-            else:
-                logger.error(f"Get columns error - Status: {response.status_code}")
-                return False, f"HTTP {response.status_code}: {response.text[:200]}"
-        except Exception as e:
-            logger.error(f"Erreur récupération colonnes: {e}")
-            return False, str(e)
+        """Récupère les colonnes d'une table (mises en cache, voir invalidate_columns)"""
+        cached = self._columns_cache.get(table_id)
+        if cached is not None:
+            return True, {'columns': list(cached.values())}
+        
+        success, data = self._request('GET', f'/tables/{table_id}/columns', "récupération colonnes", timeout=10)
+        if success:
+            self._columns_cache[table_id] = {col['id']: col for col in data.get('columns', [])}
+        return success, data
+    
+    def invalidate_columns(self, table_id: Optional[str] = None):
+        """Vide le cache des colonnes d'une table (ou de toutes) après un changement de schéma"""
+        if table_id is None:
+            self._columns_cache.clear()
+        else:
+            self._columns_cache.pop(table_id, None)
     
     def get_table_data(self, table_id: str, limit: Optional[int] = None) -> Tuple[bool, Any]:
-        """Récupère les données d'une table"""
+        """Récupère les données d'une table (If-None-Match si un ETag est connu)"""
+        params = {}
+        if limit:
+            params['limit'] = limit
+        
+        return self._request('GET', f'/tables/{table_id}/records', f"données {table_id}",
+                             cache_key=(table_id, limit), params=params, timeout=30)
+    
+    def stream_records(self, table_id: str) -> Tuple[bool, Any]:
+        """Itère sur les enregistrements d'une table sans charger toute la réponse en mémoire
+        
+        Renvoie (True, itérateur de records). Sans ijson (ou en HTTP/2), repli sur get_table_data.
+        """
+        if ijson is None or self.http_client is not None:
+            success, data = self.get_table_data(table_id)
+            if not success:
+                return False, data
+            return True, iter(data['records'])
+        
         try:
             url = f"{self.base_url}/docs/{self.doc_id}/tables/{table_id}/records"
-            params = {}
-            if limit:
-                params['limit'] = limit
-            
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            if response.status_code == 200:
-                return True, response.json()
-            return False, response.text
-        except Exception as e:
-            logger.error(f"Erreur récupération données: {e}")
+            response = self.session.get(url, stream=True, timeout=30)
+            if response.status_code != 200:
+                text = response.text
+                response.close()
+                return False, text
+            
+            # Décompresser gzip/deflate avant le parseur
+            response.raw.decode_content = True
+            return True, self._iter_streamed_records(response)
+        except _NETWORK_ERRORS as e:
+            logger.error(f"Erreur lecture en flux des données: {e}")
             return False, str(e)
     
+    @staticmethod
+    def _iter_streamed_records(response) -> Iterator[Dict[str, Any]]:
+        """Parse les records au fil du téléchargement et libère la connexion à la fin"""
+        try:
+            yield from ijson.items(response.raw, 'records.item', use_float=True)
+        finally:
+            response.close()
+    
     def update_record(self, table_id: str, record_id: int, fields: Dict[str, Any]) -> Tuple[bool, Any]:
         """Met à jour un enregistrement Grist"""
-        try:
-            url = f"{self.base_url}/docs/{self.doc_id}/tables/{table_id}/records"
-            
-            data = {
-                "records": [
-                    {
-                        "id": record_id,
-                        "fields": fields
-                    }
-                ]
-            }
-            
-            response = requests.patch(url, headers=self.headers, json=data, timeout=30)
-            
-            if response.status_code == 200:
-                return True, response.json()
-            else:
-                logger.error(f"Erreur mise à jour record: {response.status_code} - {response.text}")
-                return False, f"HTTP {response.status_code}: {response.text}"
-                
-        except Exception as e:
-            logger.error(f"Erreur mise à jour record Grist: {e}")
-            return False, str(e)
+        data = {
+            "records": [
+                {
+                    "id": record_id,
+                    "fields": fields
+                }
+            ]
+        }
+        return self._request('PATCH', f'/tables/{table_id}/records', "mise à jour record", json=data, timeout=30)
     
-    def calculate_data_hash(self, record_fields: Dict[str, Any], columns_to_sync: List[str]) -> str:
-        """Calcule un hash des données à synchroniser pour détecter les changements"""
+    def calculate_data_hash(self, record_fields: Dict[str, Any], columns_to_sync: Sequence[str]) -> str:
+        """Calcule un hash des données à synchroniser pour détecter les changements
+        
+        La forme (JSON trié, MD5 tronqué) est celle des sync_hash déjà stockés dans Grist :
+        la changer ferait resynchroniser tous les enregistrements.
+        """
         # Extraire seulement les colonnes qui sont synchronisées
-        sync_data = {}
-        for col in columns_to_sync:
-            if col in record_fields:
-                sync_data[col] = record_fields[col]
+        sync_data = {col: record_fields[col] for col in columns_to_sync if col in record_fields}
         
         # Créer un hash stable
         data_str = json.dumps(sync_data, sort_keys=True, default=str)
         return hashlib.md5(data_str.encode()).hexdigest()[:12]  # 12 caractères suffisent
     
-    def update_sync_status(self, table_id: str, record_id: int, success: bool, message: str = "", timestamp: datetime = None, data_hash: str = None) -> Tuple[bool, Any]:
-        """Met à jour le statut de synchronisation dans Grist avec hash des données"""
+    @staticmethod
+    def _sync_status_fields(success: bool, message: str = "", timestamp: datetime = None, data_hash: str = None) -> Dict[str, Any]:
+        """Construit les champs de statut de synchronisation"""
         if timestamp is None:
             timestamp = datetime.now()
             
@@ -152,82 +461,216 @@ class GristClient:
         if data_hash:
             fields["sync_hash"] = data_hash
         
-        return self.update_record(table_id, record_id, fields)
+        return fields
+    
+    def update_sync_status(self, table_id: str, record_id: int, success: bool, message: str = "", timestamp: datetime = None, data_hash: str = None) -> Tuple[bool, Any]:
+        """Met à jour le statut de synchronisation dans Grist avec hash des données"""
+        fields = self._sync_status_fields(success, message, timestamp, data_hash)
+        result = self.update_record(table_id, record_id, fields)
+        if result[0]:
+            self._remember_sync_hashes(table_id, [{"id": record_id, "fields": fields}])
+        return result
     
-    def get_records_to_sync(self, table_id: str, dossier_number_column: str, status_column: str = "sync_status", columns_to_sync: List[str] = None, detect_changes: bool = True) -> Tuple[bool, Any]:
+    def get_records_to_sync(self, table_id: str, dossier_number_column: str, status_column: str = "sync_status", columns_to_sync: Sequence[str] = None, detect_changes: bool = True) -> Tuple[bool, Any]:
         """Récupère les enregistrements qui doivent être synchronisés avec détection automatique des changements"""
         try:
-            success, data = self.get_table_data(table_id)
+            success, records = self.iter_records_to_sync(table_id, dossier_number_column, status_column, columns_to_sync, detect_changes)
             if not success:
-                return False, data
+                return False, records
+            return True, list(records)
             
-            # Filtrer les enregistrements qui ont un numéro de dossier et doivent être synchronisés
-            records_to_sync = []
-            for record in data['records']:
-                fields = record['fields']
-                
-                # Vérifier qu'il y a un numéro de dossier
-                if dossier_number_column not in fields or not fields[dossier_number_column]:
-                    continue
-                
-                should_sync = False
-                
-                # Vérifier le statut (si la colonne existe)
-                if status_column in fields:
-                    status = fields[status_column]
-                    # Synchroniser si pas encore fait ou en erreur
-                    if status in [None, "", "error", "pending"]:
-                        should_sync = True
-                        logger.info(f"Record {record['id']}: sync car statut = '{status}'")
-                    elif detect_changes and columns_to_sync and status == "success":
-                        # Détecter les changements depuis la dernière sync
-                        current_hash = self.calculate_data_hash(fields, columns_to_sync)
-                        stored_hash = fields.get("sync_hash", "")
-                        
-                        if current_hash != stored_hash:
-                            should_sync = True
-                            logger.info(f"Record {record['id']}: sync car données modifiées (hash: {stored_hash} → {current_hash})")
-                        else:
-                            logger.debug(f"Record {record['id']}: pas de changement (hash: {current_hash})")
+        except Exception as e:
+            logger.error(f"Erreur récupération records à synchroniser: {e}")
+            return False, str(e)
+    
+    def iter_records_to_sync(self, table_id: str, dossier_number_column: str, status_column: str = "sync_status", columns_to_sync: Sequence[str] = None, detect_changes: bool = True) -> Tuple[bool, Any]:
+        """Comme get_records_to_sync, mais renvoie (True, itérateur) : les records sont
+        sélectionnés au fil de la réception, sans matérialiser la table
+        """
+        try:
+            records = None
+            if not (detect_changes and columns_to_sync):
+                # Sans détection de changements, seuls les statuts en attente comptent :
+                # filtrer côté serveur pour ne pas transférer les lignes déjà synchronisées
+                success, data = self.get_filtered_records(table_id, filters={status_column: list(self._PENDING_STATUSES)})
+                if success:
+                    records = iter(data['records'])
                 else:
-                    # Pas de colonne de statut = synchroniser
-                    should_sync = True
-                    logger.info(f"Record {record['id']}: sync car pas de colonne statut")
-                
-                if should_sync:
-                    # Ajouter le hash actuel pour utilisation ultérieure
-                    if columns_to_sync:
-                        record['_current_hash'] = self.calculate_data_hash(fields, columns_to_sync)
-                    records_to_sync.append(record)
-            
-            logger.info(f"Détection terminée: {len(records_to_sync)}/{len(data['records'])} enregistrements à synchroniser")
-            return True, records_to_sync
+                    logger.info(f"Filtre serveur sur {status_column} indisponible, parcours complet: {data}")
+            
+            if records is None:
+                # Parcours complet, en flux quand c'est possible
+                success, records = self.stream_records(table_id)
+                if not success:
+                    return False, records
+            
+            columns_to_sync = tuple(columns_to_sync) if columns_to_sync else ()
+            
+            # Toutes les lignes d'une table ont les mêmes colonnes : le premier record suffit
+            # pour choisir une fois pour toutes la boucle de parcours adaptée
+            first = next(records, None)
+            if first is None:
+                logger.info("Détection terminée: 0/0 enregistrements à synchroniser")
+                return True, iter(())
+            
+            source = records
+            records = itertools.chain((first,), records)
+            if status_column not in first['fields']:
+                cached_hashes = self._load_sync_hashes(table_id) if detect_changes and columns_to_sync else {}
+                scan = self._scan_no_status_column(records, dossier_number_column, columns_to_sync, cached_hashes)
+            elif detect_changes and columns_to_sync:
+                # Derniers hash synchronisés connus localement (cache SQLite), prioritaires sur sync_hash
+                cached_hashes = self._load_sync_hashes(table_id)
+                scan = self._scan_with_change_detection(records, dossier_number_column, status_column, columns_to_sync, cached_hashes)
+            else:
+                scan = self._scan_status_only(records, dossier_number_column, status_column, columns_to_sync)
+            return True, self._iter_scan(scan, source)
             
         except Exception as e:
             logger.error(f"Erreur récupération records à synchroniser: {e}")
             return False, str(e)
     
+    @staticmethod
+    def _iter_scan(scan: Generator[Dict, None, int], source: Iterator[Dict]) -> Iterator[Dict]:
+        """Relaie les records retenus par un parcours, puis journalise son bilan (total renvoyé par le parcours)
+        
+        Même si l'appelant s'arrête avant la fin (islice, exception) et ferme l'itérateur, le parcours
+        et sa source (réponse HTTP lue en flux) sont fermés et le bilan est journalisé.
+        """
+        selected = 0
+        total = None
+        try:
+            while True:
+                try:
+                    record = next(scan)
+                except StopIteration as stop:
+                    total = stop.value
+                    return
+                selected += 1
+                yield record
+        finally:
+            scan.close()
+            close = getattr(source, 'close', None)
+            if close is not None:
+                close()
+            if total is None:
+                logger.info(f"Détection interrompue: {selected} enregistrements à synchroniser relayés")
+            else:
+                logger.info(f"Détection terminée: {selected}/{total} enregistrements à synchroniser")
+    
+    def _scan_status_only(self, records: Iterator[Dict], dossier_number_column: str, status_column: str, columns_to_sync: Tuple[str, ...]) -> Generator[Dict, None, int]:
+        """Parcours sans détection de changements : seuls les statuts en attente sont synchronisés"""
+        pending = self._PENDING_STATUSES
+        hash_of = self.calculate_data_hash
+        info_enabled = logger.isEnabledFor(logging.INFO)
+        total = 0
+        for record in records:
+            total += 1
+            fields = record['fields']
+            if not fields.get(dossier_number_column):
+                continue
+            
+            status = fields.get(status_column)
+            if status in pending:
+                if info_enabled:
+                    logger.info("Record %s: sync car statut = '%s'", record['id'], status)
+                if columns_to_sync:
+                    record['_current_hash'] = hash_of(fields, columns_to_sync)
+                yield record
+        return total
+    
+    def _scan_with_change_detection(self, records: Iterator[Dict], dossier_number_column: str, status_column: str, columns_to_sync: Tuple[str, ...], cached_hashes: Dict[int, str]) -> Generator[Dict, None, int]:
+        """Parcours avec détection de changements : statuts en attente + lignes 'success' dont le hash a changé"""
+        pending = self._PENDING_STATUSES
+        hash_of = self.calculate_data_hash
+        # Niveaux de log évalués une fois : les logs de la boucle sont formatés en différé (%s)
+        info_enabled = logger.isEnabledFor(logging.INFO)
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        total = 0
+        for record in records:
+            total += 1
+            fields = record['fields']
+            if not fields.get(dossier_number_column):
+                continue
+            
+            status = fields.get(status_column)
+            if status in pending:
+                if info_enabled:
+                    logger.info("Record %s: sync car statut = '%s'", record['id'], status)
+                record['_current_hash'] = hash_of(fields, columns_to_sync)
+                yield record
+            elif status == "success":
+                # Détecter les changements depuis la dernière sync
+                current_hash = hash_of(fields, columns_to_sync)
+                stored_hash = cached_hashes.get(record['id']) or fields.get("sync_hash", "")
+                if current_hash != stored_hash:
+                    if info_enabled:
+                        logger.info("Record %s: sync car données modifiées (hash: %s → %s)", record['id'], stored_hash, current_hash)
+                    record['_current_hash'] = current_hash
+                    yield record
+                elif debug_enabled:
+                    logger.debug("Record %s: pas de changement (hash: %s)", record['id'], current_hash)
+        return total
+    
+    def _scan_no_status_column(self, records: Iterator[Dict], dossier_number_column: str, columns_to_sync: Tuple[str, ...], cached_hashes: Dict[int, str]) -> Generator[Dict, None, int]:
+        """Parcours d'une table sans colonne de statut : tout synchroniser, sauf les lignes inchangées selon le cache local"""
+        hash_of = self.calculate_data_hash
+        info_enabled = logger.isEnabledFor(logging.INFO)
+        total = 0
+        for record in records:
+            total += 1
+            fields = record['fields']
+            if not fields.get(dossier_number_column):
+                continue
+            
+            current_hash = hash_of(fields, columns_to_sync) if columns_to_sync else None
+            cached_hash = cached_hashes.get(record['id'])
+            if cached_hash is None:
+                if info_enabled:
+                    logger.info("Record %s: sync car pas de colonne statut", record['id'])
+            elif current_hash != cached_hash:
+                if info_enabled:
+                    logger.info("Record %s: sync car données modifiées (cache local)", record['id'])
+            else:
+                continue
+            
+            if current_hash is not None:
+                record['_current_hash'] = current_hash
+            yield record
+        return total
+    
     def get_column_type(self, table_id: str, column_id: str) -> str:
         """Récupère le type d'une colonne spécifique"""
         try:
-            success, columns_data = self.get_table_columns(table_id)
-            if not success:
-                return 'Text'  # Type par défaut
+            if table_id not in self._columns_cache:
+                success, _ = self.get_table_columns(table_id)
+                if not success:
+                    return 'Text'  # Type par défaut
             
-            for column in columns_data.get('columns', []):
-                if column['id'] == column_id:
-                    # Gestion de la structure Grist
-                    if 'fields' in column and 'type' in column['fields']:
-                        return column['fields']['type']
-                    else:
-                        return column.get('type', 'Text')
+            column = self._columns_cache[table_id].get(column_id)
+            if column is None:
+                return 'Text'  # Type par défaut si colonne non trouvée
             
-            return 'Text'  # Type par défaut si colonne non trouvée
+            return self._column_type(column)
             
         except Exception as e:
             logger.error(f"Erreur récupération type colonne {column_id}: {e}")
             return 'Text'
     
+    def get_columns_schema(self, table_id: str) -> Dict[str, str]:
+        """Renvoie {colId: type} pour toutes les colonnes d'une table, en un seul appel (mis en cache)"""
+        success, columns_data = self.get_table_columns(table_id)
+        if not success:
+            return {}
+        return {column['id']: self._column_type(column) for column in columns_data.get('columns', [])}
+    
+    @staticmethod
+    def _column_type(column: Dict[str, Any]) -> str:
+        """Extrait le type d'une colonne (gestion de la structure Grist)"""
+        if 'fields' in column and 'type' in column['fields']:
+            return column['fields']['type']
+        return column.get('type', 'Text')
+    
     def prepare_sync_columns(self, table_id: str) -> Tuple[bool, Any]:
         """Prépare les colonnes de statut de synchronisation si elles n'existent pas"""
         try:
@@ -268,115 +711,55 @@ class GristClient:
     # Autres méthodes inchangées...
     def add_record(self, table_id: str, fields: Dict[str, Any]) -> Tuple[bool, Any]:
         """Ajoute un nouvel enregistrement à une table Grist"""
-        try:
-            url = f"{self.base_url}/docs/{self.doc_id}/tables/{table_id}/records"
-            
-            data = {
-                "records": [
-                    {
-                        "fields": fields
-                    }
-                ]
-            }
-            
-            response = requests.post(url, headers=self.headers, json=data, timeout=30)
-            
-            if response.status_code == 200:
-                return True, response.json()
-            else:
-                logger.error(f"Erreur ajout record: {response.status_code} - {response.text}")
-                return False, f"HTTP {response.status_code}: {response.text}"
-                
-        except Exception as e:
-            logger.error(f"Erreur ajout record Grist: {e}")
-            return False, str(e)
+        data = {
+            "records": [
+                {
+                    "fields": fields
+                }
+            ]
+        }
+        return self._request('POST', f'/tables/{table_id}/records', "ajout record", json=data, timeout=30)
     
     def delete_record(self, table_id: str, record_id: int) -> Tuple[bool, Any]:
         """Supprime un enregistrement d'une table Grist"""
-        try:
-            url = f"{self.base_url}/docs/{self.doc_id}/tables/{table_id}/records"
-            
-            data = {
-                "records": [record_id]
-            }
-            
-            response = requests.delete(url, headers=self.headers, json=data, timeout=30)
-            
-            if response.status_code == 200:
-                return True, response.json()
-            else:
-                logger.error(f"Erreur suppression record: {response.status_code} - {response.text}")
-                return False, f"HTTP {response.status_code}: {response.text}"
-                
-        except Exception as e:
-            logger.error(f"Erreur suppression record Grist: {e}")
-            return False, str(e)
+        data = {
+            "records": [record_id]
+        }
+        return self._request('DELETE', f'/tables/{table_id}/records', "suppression record", json=data, timeout=30)
     
     def get_filtered_records(self, table_id: str, filters: Dict[str, Any] = None, limit: Optional[int] = None) -> Tuple[bool, Any]:
         """Récupère les enregistrements avec filtres optionnels"""
-        try:
-            url = f"{self.base_url}/docs/{self.doc_id}/tables/{table_id}/records"
-            params = {}
-            
-            if limit:
-                params['limit'] = limit
-            
-            # Ajouter les filtres si fournis
-            if filters:
-                for key, value in filters.items():
-                    params[f"filter[{key}]"] = value
-            
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            
-            if response.status_code == 200:
-                return True, response.json()
-            return False, response.text
-            
-        except Exception as e:
-            logger.error(f"Erreur récupération données filtrées: {e}")
-            return False, str(e)
+        params = {}
+        
+        if limit:
+            params['limit'] = limit
+        
+        # Ajouter les filtres si fournis (format Grist : filter={"col": [v1, v2]})
+        if filters:
+            params['filter'] = orjson.dumps({
+                key: list(value) if isinstance(value, (list, tuple, set)) else [value]
+                for key, value in filters.items()
+            }).decode()
+        
+        return self._request('GET', f'/tables/{table_id}/records', "données filtrées", params=params, timeout=30)
     
     def bulk_update_records(self, table_id: str, updates: List[Dict[str, Any]]) -> Tuple[bool, Any]:
         """Met à jour plusieurs enregistrements en une seule fois"""
-        try:
-            url = f"{self.base_url}/docs/{self.doc_id}/tables/{table_id}/records"
-            
-            # Formater les données pour l'API Grist
-            records = []
-            for update in updates:
-                if 'id' in update and 'fields' in update:
-                    records.append({
-                        "id": update['id'],
-                        "fields": update['fields']
-                    })
-            
-            if not records:
-                return False, "Aucun enregistrement à mettre à jour"
-            
-            data = {"records": records}
-            
-            response = requests.patch(url, headers=self.headers, json=data, timeout=60)
-            
-            if response.status_code == 200:
-                return True, response.json()
-            else:
-                logger.error(f"Erreur mise à jour bulk: {response.status_code} - {response.text}")
-                return False, f"HTTP {response.status_code}: {response.text}"
-                
-        except Exception as e:
-            logger.error(f"Erreur mise à jour bulk Grist: {e}")
-            return False, str(e)
+        # Formater les données pour l'API Grist
+        records = []
+        for update in updates:
+            if 'id' in update and 'fields' in update:
+                records.append({
+                    "id": update['id'],
+                    "fields": update['fields']
+                })
+        
+        if not records:
+            return False, "Aucun enregistrement à mettre à jour"
+        
+        data = {"records": records}
+        return self._request('PATCH', f'/tables/{table_id}/records', "mise à jour bulk", json=data, timeout=60)
     
     def get_document_info(self) -> Tuple[bool, Any]:
         """Récupère les informations du document"""
-        try:
-            url = f"{self.base_url}/docs/{self.doc_id}"
-            response = requests.get(url, headers=self.headers, timeout=10)
-            
-            if response.status_code == 200:
-                return True, response.json()
-            return False, f"HTTP {response.status_code}: {response.text}"
-            
-        except Exception as e:
-            logger.error(f"Erreur récupération info document: {e}")
-            return False, str(e)
\ No newline at end of file
+        return self._request('GET', '', "info document", timeout=10)
\ No newline at end of file
@@ -5,14 +5,21 @@ Utilisation: python sync_cli.py --config config.json [options]
 """
 
 import argparse
-import json
 import logging
 import sys
+import orjson
 from pathlib import Path
 from datetime import datetime
 
 from sync_engine import SyncEngine, SyncConfig
 
+# Champs obligatoires du fichier de configuration
+REQUIRED_FIELDS = frozenset([
+    'grist_base_url', 'grist_token', 'grist_doc_id', 'grist_table_id',
+    'dossier_number_column', 'ds_token', 'ds_instructeur_id',
+    'ds_demarche_number', 'column_mapping'
+])
+
 def setup_logging(level=logging.INFO, log_file=None):
     """Configure le logging"""
     handlers = [logging.StreamHandler(sys.stdout)]
@@ -29,19 +36,12 @@ def setup_logging(level=logging.INFO, log_file=None):
 def load_config(config_path: str) -> SyncConfig:
     """Charge la configuration depuis un fichier JSON"""
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config_data = json.load(f)
+        config_data = orjson.loads(Path(config_path).read_bytes())
         
         # Valider les champs requis
-        required_fields = [
-            'grist_base_url', 'grist_token', 'grist_doc_id', 'grist_table_id',
-            'dossier_number_column', 'ds_token', 'ds_instructeur_id', 
-            'ds_demarche_number', 'column_mapping'
-        ]
-        
-        for field in required_fields:
-            if field not in config_data:
-                raise ValueError(f"Champ requis manquant dans la configuration: {field}")
+        missing = REQUIRED_FIELDS - config_data.keys()
+        if missing:
+            raise ValueError(f"Champ requis manquant dans la configuration: {', '.join(sorted(missing))}")
         
         return SyncConfig(**config_data)
         
@@ -76,8 +76,7 @@ def create_sample_config(output_path: str):
     }
     
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(sample_config, f, indent=2, ensure_ascii=False)
+        Path(output_path).write_bytes(orjson.dumps(sample_config, option=orjson.OPT_INDENT_2))
         print(f"Configuration exemple créée: {output_path}")
         print("Éditez ce fichier avec vos paramètres avant utilisation.")
     except Exception as e:
@@ -300,6 +299,8 @@ Exemples d'utilisation:
         logger.error(f"Erreur inattendue: {e}")
         print(f"\n💥 Erreur inattendue: {e}")
         sys.exit(1)
+    finally:
+        sync_engine.close()
 
 if __name__ == '__main__':
     main()
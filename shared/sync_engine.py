@@ -3,13 +3,16 @@ Moteur de synchronisation Grist → DS
 Version simplifiée avec détection automatique des modifications
 """
 
+import itertools
 import logging
-from datetime import datetime
-from typing import Dict, List, Any, Tuple, Optional
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Tuple, Optional, Iterator, NamedTuple
 from dataclasses import dataclass
 
 from ds_client import DSClient
-from grist_client import GristClient
+from grist_client import GristClient, BackgroundStatusWriter
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +40,14 @@ class SyncConfig:
     update_grist_status: bool = True
     dry_run: bool = False
     detect_changes: bool = True  # Nouvelle option pour détecter les modifications
+    cache_path: Optional[str] = None  # Cache SQLite local des hash synchronisés et des dossiers DS (optionnel)
+    max_workers: int = 8  # Enregistrements synchronisés en parallèle
+    max_error_rate: float = 0.5  # Au-delà (après min_records_for_breaker), on arrête la synchronisation
+    min_records_for_breaker: int = 10
+    http2: bool = False  # HTTP/2 (httpx) vers Grist et DS si disponible
+    status_batch_size: int = 200  # Statuts Grist envoyés par PATCH groupé
+    max_pending_records: int = 500  # Enregistrements lus en avance en attente d'un worker (mémoire bornée)
+    validate_compatibility: bool = True  # Rapport de compatibilité avant synchronisation (désactivable pour les runs planifiés)
 
 @dataclass
 class SyncResult:
@@ -49,32 +60,92 @@ class SyncResult:
     error_details: List[Dict]
     execution_time: float
 
+class _ColumnPlan(NamedTuple):
+    """Colonne synchronisée, types résolus une fois par synchronisation"""
+    grist_column: str
+    annotation_label: str
+    ds_type_default: str
+    grist_type: str
+
 class SyncEngine:
     def __init__(self, config: SyncConfig):
         self.config = config
+        # Un client (et donc un pool de connexions keep-alive) par API, pour toute la durée du moteur
         self.grist_client = GristClient(
             config.grist_base_url,
             config.grist_token,
-            config.grist_doc_id
+            config.grist_doc_id,
+            http2=config.http2,
+            cache_path=config.cache_path
         )
         self.ds_client = DSClient(
             config.ds_token,
-            config.ds_instructeur_id
+            config.ds_instructeur_id,
+            http2=config.http2,
+            cache_path=config.cache_path
         )
+        # Plan des colonnes synchronisées, recalculé à chaque execute_sync
+        self._plan: Tuple[_ColumnPlan, ...] = ()
+        # Compatibilité ne dépendant que des types : {(type Grist, type DS): compatibilité ou None}
+        self._compat_cache: Dict[Tuple[str, str], Optional[str]] = {}
+    
+    def _load_column_types(self) -> Dict[str, str]:
+        """Types des colonnes synchronisées, lus en une fois depuis le schéma Grist"""
+        schema = self.grist_client.get_columns_schema(self.config.grist_table_id)
+        return {grist_col: schema.get(grist_col, 'Text') for grist_col in self.config.column_mapping}
+    
+    def _build_sync_plan(self) -> Tuple[_ColumnPlan, ...]:
+        """Résout une fois les types Grist et DS de chaque colonne synchronisée
         
+        Le plan est un tuple de tuples nommés, dépaquetés directement dans la boucle de sync_record.
+        """
+        column_types = self._load_column_types()
+        annotation_types = self.get_annotation_types_mapping()
+        self._plan = tuple(
+            _ColumnPlan(grist_col, annotation_label, annotation_types.get(annotation_label, 'text'), column_types[grist_col])
+            for grist_col, annotation_label in self.config.column_mapping.items()
+        )
+        return self._plan
+    
+    def _compatibility(self, grist_type: str, ds_type: str, value: Any) -> str:
+        """Compatibilité d'une valeur ; la valeur n'est examinée que si les types ne suffisent pas"""
+        key = (grist_type, ds_type)
+        if key not in self._compat_cache:
+            self._compat_cache[key] = self.ds_client.schema_compatibility(grist_type, ds_type)
+        compatibility = self._compat_cache[key]
+        if compatibility is None:
+            compatibility = self.ds_client.check_compatibility(grist_type, ds_type, value)
+        return compatibility
+    
+    def close(self):
+        """Ferme les connexions des clients Grist et DS"""
+        self.grist_client.close()
+        self.ds_client.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
     def test_connections(self) -> Dict[str, Any]:
-        """Test les connexions à Grist et DS"""
+        """Test les connexions à Grist et DS (en parallèle)"""
         results = {}
         
+        # Les deux sondes sont indépendantes : durée = max(Grist, DS) au lieu de la somme
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            grist_future = executor.submit(self.grist_client.test_connection)
+            ds_future = executor.submit(self.ds_client.test_connection)
+            grist_success, grist_data = grist_future.result()
+            ds_success, ds_data = ds_future.result()
+        
         # Test Grist
-        grist_success, grist_data = self.grist_client.test_connection()
         results['grist'] = {
             'success': grist_success,
             'data': grist_data
         }
         
         # Test DS
-        ds_success, ds_data = self.ds_client.test_connection()
         results['ds'] = {
             'success': ds_success,
             'data': ds_data
@@ -129,20 +200,11 @@ class SyncEngine:
             'details': []
         }
         
-        # Récupérer les types de colonnes Grist
-        grist_column_types = {}
-        for grist_col in self.config.column_mapping.keys():
-            grist_column_types[grist_col] = self.grist_client.get_column_type(
-                self.config.grist_table_id, grist_col
-            )
-        
-        # Récupérer les types d'annotations DS
-        annotation_types = self.get_annotation_types_mapping()
+        # Types Grist et DS de chaque colonne (plan de la synchronisation en cours, sinon calculé)
+        plan = self._plan or self._build_sync_plan()
         
         # Vérifier la compatibilité pour chaque mapping
-        for grist_col, annotation_label in self.config.column_mapping.items():
-            grist_type = grist_column_types.get(grist_col, 'Text')
-            ds_type = annotation_types.get(annotation_label, 'text')
+        for grist_col, annotation_label, ds_type, grist_type in plan:
             
             # Tester avec des valeurs échantillon
             sample_values = []
@@ -154,7 +216,7 @@ class SyncEngine:
             compatibilities = []
             for value in sample_values:
                 if value is not None and value != '':
-                    compatibility = self.ds_client.check_compatibility(grist_type, ds_type, value)
+                    compatibility = self._compatibility(grist_type, ds_type, value)
                     compatibilities.append(compatibility)
             
             # Déterminer la compatibilité globale
@@ -186,8 +248,69 @@ class SyncEngine:
         
         return compatibility_report
     
-    def sync_record(self, grist_record: Dict, dossier_mapping: Dict[int, str]) -> Dict[str, Any]:
-        """Synchronise un enregistrement Grist vers DS"""
+    def _resolve_dossier(self, fields: Dict, dossier_mapping: Dict[int, str]) -> Tuple[Optional[int], Optional[str], Optional[str]]:
+        """Valide le numéro de dossier d'un enregistrement, sans lever d'exception
+        
+        Renvoie (numéro, UUID, erreur) ; erreur vaut None si le dossier est valide et présent dans la démarche.
+        """
+        if self.config.dossier_number_column not in fields:
+            return None, None, f"Colonne {self.config.dossier_number_column} introuvable"
+        
+        raw_dossier_number = fields[self.config.dossier_number_column]
+        if not raw_dossier_number:
+            return None, None, "Numéro de dossier vide"
+        
+        # Nettoyer et convertir le numéro de dossier
+        if isinstance(raw_dossier_number, str):
+            cleaned = raw_dossier_number.strip()
+            digits = cleaned[1:] if cleaned[:1] in ('+', '-') else cleaned
+            if not digits.isdecimal():
+                return None, None, f"Numéro de dossier invalide: {raw_dossier_number} (valeur non numérique)"
+            dossier_number = int(cleaned)
+        elif isinstance(raw_dossier_number, (int, float)):
+            if raw_dossier_number != raw_dossier_number or raw_dossier_number in (float('inf'), float('-inf')):
+                return None, None, f"Numéro de dossier invalide: {raw_dossier_number} (valeur non finie)"
+            dossier_number = int(raw_dossier_number)
+        else:
+            return None, None, f"Numéro de dossier invalide: {raw_dossier_number} (Type non supporté: {type(raw_dossier_number)})"
+        
+        if dossier_number <= 0:
+            return None, None, f"Numéro de dossier invalide: {raw_dossier_number} (Le numéro de dossier doit être positif)"
+        
+        # Récupérer l'UUID du dossier
+        dossier_uuid = dossier_mapping.get(dossier_number)
+        if dossier_uuid is None:
+            return dossier_number, None, f"Dossier {dossier_number} non trouvé dans la démarche"
+        
+        return dossier_number, dossier_uuid, None
+    
+    def _prepare_record(self, grist_record: Dict, dossier_mapping: Dict[int, str]) -> Optional[Dict[str, Any]]:
+        """Résout le dossier d'un enregistrement avant de le confier à un worker
+        
+        Renvoie None si le dossier est valide (l'enregistrement reçoit alors _dossier_number et
+        _dossier_uuid), sinon le résultat en erreur, obtenu sans aucun appel DS.
+        """
+        dossier_number, dossier_uuid, error = self._resolve_dossier(grist_record['fields'], dossier_mapping)
+        if error:
+            return {
+                'grist_record_id': grist_record['id'],
+                'dossier_number': dossier_number,
+                'dossier_uuid': None,
+                'updates': [],
+                'unchanged': [],
+                'errors': [error],
+                'status': 'error'
+            }
+        grist_record['_dossier_number'] = dossier_number
+        grist_record['_dossier_uuid'] = dossier_uuid
+        return None
+    
+    def sync_record(self, grist_record: Dict, dossier_mapping: Dict[int, str], annotations_by_dossier: Optional[Dict[int, Dict[str, Dict]]] = None) -> Dict[str, Any]:
+        """Synchronise un enregistrement Grist vers DS
+        
+        annotations_by_dossier (numéro → {label: annotation typée}) évite une requête DS par dossier ;
+        à défaut, les annotations sont récupérées pour ce seul dossier.
+        """
         record_id = grist_record['id']
         fields = grist_record['fields']
         
@@ -196,102 +319,77 @@ class SyncEngine:
             'dossier_number': None,
             'dossier_uuid': None,
             'updates': [],
+            'unchanged': [],
             'errors': [],
             'status': 'pending'
         }
         
         try:
-            # Récupérer et valider le numéro de dossier
-            if self.config.dossier_number_column not in fields:
-                result['errors'].append(f"Colonne {self.config.dossier_number_column} introuvable")
-                result['status'] = 'error'
-                return result
-            
-            raw_dossier_number = fields[self.config.dossier_number_column]
-            if not raw_dossier_number:
-                result['errors'].append("Numéro de dossier vide")
-                result['status'] = 'error'
-                return result
-            
-            # Nettoyer et convertir le numéro de dossier
-            try:
-                if isinstance(raw_dossier_number, str):
-                    dossier_number = int(raw_dossier_number.strip())
-                elif isinstance(raw_dossier_number, (int, float)):
-                    dossier_number = int(raw_dossier_number)
-                else:
-                    raise ValueError(f"Type non supporté: {type(raw_dossier_number)}")
-                
-                if dossier_number <= 0:
-                    raise ValueError("Le numéro de dossier doit être positif")
-                    
-            except (ValueError, TypeError) as e:
-                result['errors'].append(f"Numéro de dossier invalide: {raw_dossier_number} ({e})")
-                result['status'] = 'error'
-                return result
+            # Numéro et UUID du dossier : déjà résolus par execute_sync, sinon validés ici
+            if '_dossier_uuid' in grist_record:
+                dossier_number, dossier_uuid = grist_record['_dossier_number'], grist_record['_dossier_uuid']
+            else:
+                dossier_number, dossier_uuid, error = self._resolve_dossier(fields, dossier_mapping)
+                if error:
+                    result['dossier_number'] = dossier_number
+                    result['errors'].append(error)
+                    result['status'] = 'error'
+                    return result
             
             result['dossier_number'] = dossier_number
-            
-            # Récupérer l'UUID du dossier
-            if dossier_number not in dossier_mapping:
-                result['errors'].append(f"Dossier {dossier_number} non trouvé dans la démarche")
-                result['status'] = 'error'
-                return result
-            
-            dossier_uuid = dossier_mapping[dossier_number]
             result['dossier_uuid'] = dossier_uuid
             
-            # Récupérer les annotations du dossier avec les types automatiques
-            success, annotations = self.ds_client.get_dossier_annotations(dossier_number)
-            if not success:
-                result['errors'].append(f"Erreur récupération annotations: {annotations}")
-                result['status'] = 'error'
-                return result
-            
-            # Créer un mapping des annotations par label avec leurs types
-            annotations_by_label = {}
-            dynamic_annotation_types = {}
-            
-            for ann in annotations:
-                annotations_by_label[ann['label']] = ann
-                # Utiliser le type ds_type automatiquement ajouté par get_dossier_annotations
-                if 'ds_type' in ann:
-                    dynamic_annotation_types[ann['label']] = ann['ds_type']
-                else:
-                    logger.warning(f"Annotation {ann['label']} sans ds_type, utilisation de 'text'")
-                    dynamic_annotation_types[ann['label']] = 'text'
+            # Récupérer les annotations du dossier avec les types automatiques (préchargées si possible)
+            if annotations_by_dossier is not None and dossier_number in annotations_by_dossier:
+                annotations_by_label = annotations_by_dossier[dossier_number]
+            else:
+                success, annotations = self.ds_client.get_dossier_annotations(dossier_number)
+                if not success:
+                    result['errors'].append(f"Erreur récupération annotations: {annotations}")
+                    result['status'] = 'error'
+                    return result
+                annotations_by_label = {ann['label']: ann for ann in annotations}
             
-            logger.info(f"Types d'annotations récupérés dynamiquement: {dynamic_annotation_types}")
+            # Types résolus une fois par synchronisation (plan calculé à la demande hors execute_sync)
+            plan = self._plan or self._build_sync_plan()
             
-            # Utiliser les types dynamiques en priorité, puis ceux de la config
-            final_annotation_types = {**self.get_annotation_types_mapping(), **dynamic_annotation_types}
+            # Méthodes résolues une fois pour toute la boucle
+            is_unchanged = self.ds_client.is_unchanged
+            compatibility_of = self._compatibility
+            dry_run = self.config.dry_run
             
-            # Traiter chaque colonne à synchroniser
-            for grist_col, annotation_label in self.config.column_mapping.items():
+            # Traiter chaque colonne à synchroniser ; les mises à jour sont envoyées ensemble après la boucle
+            pending_updates = []
+            for grist_col, annotation_label, ds_type_default, grist_type in plan:
                 if grist_col not in fields:
                     continue
                 
+                # Utiliser le type de l'annotation du dossier (via __typename) en priorité, puis celui de la config
+                annotation = annotations_by_label.get(annotation_label)
+                ds_type = annotation.get('ds_type', 'text') if annotation is not None else ds_type_default
+                
                 value = fields[grist_col]
-                if value is None or (value == '' and final_annotation_types.get(annotation_label, 'text') != 'checkbox'):
+                if value is None or (value == '' and ds_type != 'checkbox'):
                     continue  # Ignorer les valeurs vides sauf pour les checkboxes
                 
-                # Trouver l'annotation
-                if annotation_label not in annotations_by_label:
+                # Annotation absente du dossier
+                if annotation is None:
                     result['errors'].append(f"Annotation '{annotation_label}' non trouvée")
                     continue
                 
-                annotation = annotations_by_label[annotation_label]
-                ds_type = final_annotation_types.get(annotation_label, 'text')
-                grist_type = self.grist_client.get_column_type(self.config.grist_table_id, grist_col)
+                # Ne propager que les vrais changements : valeur identique à celle déjà dans DS
+                if is_unchanged(dossier_uuid, annotation['id'], value, ds_type):
+                    result['unchanged'].append(annotation_label)
+                    continue
                 
-                # Vérifier la compatibilité
-                compatibility = self.ds_client.check_compatibility(grist_type, ds_type, value)
+                # Vérifier la compatibilité (la valeur n'est examinée que si nécessaire)
+                compatibility = compatibility_of(grist_type, ds_type, value)
                 if compatibility == 'incompatible':
                     result['errors'].append(f"Types incompatibles pour {grist_col}: {grist_type} → {ds_type}")
                     continue
                 
                 # Mode dry run
-                if self.config.dry_run:
+                if dry_run:
                     result['updates'].append({
                         'grist_column': grist_col,
                         'annotation_label': annotation_label,
@@ -304,24 +402,33 @@ class SyncEngine:
                     })
                     continue
                 
-                # Effectuer la mise à jour avec le bon type
-                success, update_result = self.ds_client.update_annotation_by_type(
-                    dossier_uuid, annotation['id'], value, ds_type, grist_type
-                )
-                
-                if success:
-                    result['updates'].append({
-                        'grist_column': grist_col,
-                        'annotation_label': annotation_label,
-                        'annotation_id': annotation['id'],
-                        'value': value,
-                        'ds_type': ds_type,
-                        'grist_type': grist_type,
-                        'compatibility': compatibility,
-                        'status': 'success'
-                    })
-                else:
-                    result['errors'].append(f"Erreur mise à jour {annotation_label}: {update_result}")
+                pending_updates.append({
+                    'grist_column': grist_col,
+                    'annotation_label': annotation_label,
+                    'annotation_id': annotation['id'],
+                    'value': value,
+                    'ds_type': ds_type,
+                    'grist_type': grist_type,
+                    'compatibility': compatibility
+                })
+            
+            # Une seule mutation GraphQL (alias par annotation) pour toutes les mises à jour du dossier
+            if pending_updates:
+                all_ok, update_results = self.ds_client.update_annotations_bulk(dossier_uuid, pending_updates)
+                if not all_ok and len(pending_updates) > 1 and not any(success for success, _ in update_results):
+                    # Mutation rejetée en bloc (une seule entrée invalide suffit) : renvoyer chaque
+                    # annotation séparément pour isoler celle qui pose problème. En série : ce code
+                    # tourne déjà dans un worker du pool, un second pool multiplierait les appels DS
+                    logger.warning(f"Mutation groupée rejetée pour le dossier {dossier_number}, envoi annotation par annotation")
+                    update_results = self.ds_client.update_many([
+                        (dossier_uuid, update['annotation_id'], update['value'], update['ds_type'], update['grist_type'])
+                        for update in pending_updates
+                    ], max_workers=1)
+                for update, (success, update_result) in zip(pending_updates, update_results):
+                    if success:
+                        result['updates'].append({**update, 'status': 'success'})
+                    else:
+                        result['errors'].append(f"Erreur mise à jour {update['annotation_label']}: {update_result}")
             
             # Déterminer le statut final
             if result['errors']:
@@ -338,7 +445,7 @@ class SyncEngine:
     
     def execute_sync(self) -> SyncResult:
         """Exécute la synchronisation complète"""
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         logger.info("Début de la synchronisation")
         
@@ -355,12 +462,22 @@ class SyncEngine:
                 execution_time=0
             )
         
+        # Résultats déjà obtenus : conservés (et rapportés) même si une exception interrompt le flux
+        results = []
+        error_details = []
+        # Itérateur des records Grist, fermé en fin de synchronisation même si la limite arrête la lecture
+        record_source = None
+        
         try:
-            # Récupérer les données Grist à synchroniser avec détection des modifications
+            # Résoudre les types de chaque colonne synchronisée (une seule fois, avant les workers)
+            self._build_sync_plan()
+            
+            # Récupérer les données Grist à synchroniser avec détection des modifications,
+            # en flux : les records sont traités au fil de la lecture
             if self.config.update_grist_status:
                 # Passer les colonnes à synchroniser pour la détection des changements
-                columns_to_sync = list(self.config.column_mapping.keys())
-                success, grist_records = self.grist_client.get_records_to_sync(
+                columns_to_sync = tuple(self.config.column_mapping)
+                success, grist_records = self.grist_client.iter_records_to_sync(
                     self.config.grist_table_id,
                     self.config.dossier_number_column,
                     columns_to_sync=columns_to_sync,
@@ -371,7 +488,7 @@ class SyncEngine:
                     self.config.grist_table_id,
                     limit=self.config.limit
                 )
-                grist_records = grist_data['records'] if success else []
+                grist_records = iter(grist_data['records']) if success else grist_data
             
             if not success:
                 return SyncResult(
@@ -381,10 +498,12 @@ class SyncEngine:
                     errors=1,
                     results=[],
                     error_details=[{'error': f'Erreur Grist: {grist_records}', 'status': 'grist_error'}],
-                    execution_time=(datetime.now() - start_time).total_seconds()
+                    execution_time=time.perf_counter() - start_time
                 )
+            record_source = grist_records
             
-            if not grist_records:
+            first_record = next(grist_records, None)
+            if first_record is None:
                 logger.info("Aucun enregistrement à synchroniser")
                 return SyncResult(
                     success=True,
@@ -393,23 +512,30 @@ class SyncEngine:
                     errors=0,
                     results=[],
                     error_details=[],
-                    execution_time=(datetime.now() - start_time).total_seconds()
+                    execution_time=time.perf_counter() - start_time
                 )
             
-            # Limiter le nombre d'enregistrements
-            if len(grist_records) > self.config.limit:
-                grist_records = grist_records[:self.config.limit]
+            # Limiter le nombre d'enregistrements (la lecture s'arrête à la limite)
+            grist_records = itertools.islice(itertools.chain((first_record,), grist_records), self.config.limit)
+            
+            logger.info(f"Synchronisation d'au plus {self.config.limit} enregistrements")
             
-            logger.info(f"Synchronisation de {len(grist_records)} enregistrements")
+            # Valider la compatibilité des données sur les premiers enregistrements (si demandé)
+            if self.config.validate_compatibility:
+                sample_records = list(itertools.islice(grist_records, 5))
+                grist_records = itertools.chain(sample_records, grist_records)
+                compatibility_report = self.validate_data_compatibility(sample_records)
+                logger.info(f"Rapport de compatibilité: {compatibility_report['compatible_count']} compatibles, "
+                           f"{compatibility_report['needs_conversion_count']} avec conversion, "
+                           f"{compatibility_report['incompatible_count']} incompatibles")
             
-            # Valider la compatibilité des données
-            compatibility_report = self.validate_data_compatibility(grist_records)
-            logger.info(f"Rapport de compatibilité: {compatibility_report['compatible_count']} compatibles, "
-                       f"{compatibility_report['needs_conversion_count']} avec conversion, "
-                       f"{compatibility_report['incompatible_count']} incompatibles")
+            # Valeurs d'annotations mémorisées par une exécution précédente : périmées, rechargées ci-dessous
+            self.ds_client.clear_current_values()
             
-            # Récupérer tous les dossiers de la démarche pour créer le mapping
-            success, dossiers_data = self.ds_client.get_dossiers(self.config.ds_demarche_number, limit=1000)
+            # Récupérer tous les dossiers de la démarche avec leurs annotations, pour créer les mappings
+            # (avec cache_path, tous les dossiers sont en cache et seuls ceux modifiés depuis la dernière
+            # exécution sont redemandés, avec un rechargement complet quotidien)
+            success, dossiers_data = self.ds_client.get_cached_dossiers_with_annotations(self.config.ds_demarche_number, limit=1000)
             if not success:
                 return SyncResult(
                     success=False,
@@ -418,49 +544,42 @@ class SyncEngine:
                     errors=1,
                     results=[],
                     error_details=[{'error': f'Erreur récupération dossiers DS: {dossiers_data}', 'status': 'ds_error'}],
-                    execution_time=(datetime.now() - start_time).total_seconds()
+                    execution_time=time.perf_counter() - start_time
                 )
             
             # Créer le mapping numéro → UUID
             dossier_mapping = {dossier['number']: dossier['id'] for dossier in dossiers_data}
+            # Annotations de chaque dossier indexées une fois par label (types DS inclus)
+            annotations_by_dossier = {
+                dossier['number']: {ann['label']: ann for ann in dossier['annotations']} for dossier in dossiers_data
+            }
             
-            # Synchroniser chaque enregistrement
-            results = []
-            error_details = []
-            successful_count = 0
+            # Synchroniser les enregistrements en parallèle (pool de threads borné)
+            # Statuts Grist écrits par lots depuis un thread dédié, hors du chemin critique
+            status_writer = None
+            if self.config.update_grist_status and not self.config.dry_run:
+                status_writer = BackgroundStatusWriter(
+                    self.grist_client, self.config.grist_table_id, max_batch_size=self.config.status_batch_size
+                )
             
-            for grist_record in grist_records:
-                sync_result = self.sync_record(grist_record, dossier_mapping)
-                
-                if sync_result['status'] == 'success':
-                    results.append(sync_result)
-                    successful_count += 1
-                else:
-                    error_details.append(sync_result)
-                
-                # Mettre à jour le statut dans Grist si configuré
-                if self.config.update_grist_status and not self.config.dry_run:
-                    success_status = sync_result['status'] == 'success'
-                    message = f"Synchronized {len(sync_result['updates'])} annotations" if success_status else f"Errors: {len(sync_result['errors'])}"
-                    
-                    # Utiliser le hash des données pour la détection des changements
-                    data_hash = grist_record.get('_current_hash')
-                    
-                    self.grist_client.update_sync_status(
-                        self.config.grist_table_id,
-                        grist_record['id'],
-                        success_status,
-                        message,
-                        data_hash=data_hash
-                    )
+            try:
+                processed_count = self._sync_records(grist_records, dossier_mapping, annotations_by_dossier, status_writer, results, error_details)
+            finally:
+                # Envoyer les derniers statuts, y compris en cas d'exception
+                if status_writer is not None:
+                    status_ok, status_error = status_writer.close()
+                    if not status_ok:
+                        logger.error(f"Erreur mise à jour des statuts Grist: {status_error}")
             
-            execution_time = (datetime.now() - start_time).total_seconds()
+            successful_count = len(results)
             
-            logger.info(f"Synchronisation terminée: {successful_count}/{len(grist_records)} réussis en {execution_time:.2f}s")
+            execution_time = time.perf_counter() - start_time
+            
+            logger.info(f"Synchronisation terminée: {successful_count}/{processed_count} réussis en {execution_time:.2f}s")
             
             return SyncResult(
                 success=True,
-                processed=len(grist_records),
+                processed=processed_count,
                 successful=successful_count,
                 errors=len(error_details),
                 results=results,
@@ -470,12 +589,113 @@ class SyncEngine:
             
         except Exception as e:
             logger.error(f"Erreur lors de la synchronisation: {e}")
+            # Un résultat par enregistrement traité (dont le statut Grist est déjà en file)
+            processed_count = len(results) + sum(1 for detail in error_details if 'grist_record_id' in detail)
+            error_details.append({'error': str(e), 'status': 'unexpected_error'})
             return SyncResult(
                 success=False,
-                processed=0,
-                successful=0,
-                errors=1,
-                results=[],
-                error_details=[{'error': str(e), 'status': 'unexpected_error'}],
-                execution_time=(datetime.now() - start_time).total_seconds()
-            )
\ No newline at end of file
+                processed=processed_count,
+                successful=len(results),
+                errors=len(error_details),
+                results=results,
+                error_details=error_details,
+                execution_time=time.perf_counter() - start_time
+            )
+        finally:
+            close = getattr(record_source, 'close', None)
+            if close is not None:
+                close()
+    
+    def _sync_records(self, grist_records: Iterator[Dict], dossier_mapping: Dict[int, str], annotations_by_dossier: Dict[int, Dict[str, Dict]],
+                      status_writer: Optional[BackgroundStatusWriter], results: List[Dict], error_details: List[Dict]) -> int:
+        """Synchronise les enregistrements au fil de leur lecture, sur le pool de workers
+        
+        Au plus max_pending_records enregistrements sont lus en avance ; les dossiers invalides
+        sont écartés sans mobiliser de worker. Un coupe-circuit arrête tout si le taux d'erreur
+        des synchronisations devient trop élevé. Renvoie le nombre d'enregistrements traités.
+        """
+        processed_count = 0
+        skipped_count = 0
+        synced_count = 0
+        sync_error_count = 0
+        max_pending = max(1, self.config.max_pending_records)
+        pending = deque()  # (grist_record, future) dans l'ordre de lecture
+        exhausted = False
+        read_error = None
+        
+        with ThreadPoolExecutor(max_workers=max(1, self.config.max_workers)) as executor:
+            while True:
+                # Alimenter le pool tant que la fenêtre de lecture n'est pas pleine
+                while not exhausted and len(pending) < max_pending:
+                    try:
+                        grist_record = next(grist_records, None)
+                    except Exception as e:
+                        # Lecture interrompue : terminer les enregistrements déjà lancés avant de remonter l'erreur
+                        read_error = e
+                        grist_record = None
+                    if grist_record is None:
+                        exhausted = True
+                        break
+                    
+                    # Écarter d'emblée les enregistrements dont le numéro de dossier est invalide ou inconnu
+                    invalid_result = self._prepare_record(grist_record, dossier_mapping)
+                    if invalid_result is not None:
+                        processed_count += 1
+                        skipped_count += 1
+                        self._record_sync_result(grist_record, invalid_result, status_writer, results, error_details)
+                        continue
+                    
+                    pending.append((grist_record, executor.submit(self.sync_record, grist_record, dossier_mapping, annotations_by_dossier)))
+                
+                if not pending:
+                    break
+                
+                grist_record, future = pending.popleft()
+                sync_result = future.result()
+                processed_count += 1
+                synced_count += 1
+                if sync_result['status'] != 'success':
+                    sync_error_count += 1
+                self._record_sync_result(grist_record, sync_result, status_writer, results, error_details)
+                
+                # Coupe-circuit : trop d'erreurs, inutile de poursuivre
+                if (synced_count >= self.config.min_records_for_breaker
+                        and sync_error_count / synced_count > self.config.max_error_rate):
+                    cancelled = sum(f.cancel() for _, f in pending)
+                    # Les enregistrements déjà en cours ne peuvent pas être annulés et écrivent dans DS :
+                    # attendre leur résultat pour écrire leur statut Grist et les compter
+                    for pending_record, pending_future in pending:
+                        if not pending_future.cancelled():
+                            processed_count += 1
+                            self._record_sync_result(pending_record, pending_future.result(), status_writer, results, error_details)
+                    logger.error(f"Taux d'erreur trop élevé ({sync_error_count}/{synced_count}), "
+                                 f"arrêt de la synchronisation ({cancelled} enregistrements non traités)")
+                    error_details.append({
+                        'error': f"Synchronisation interrompue: {sync_error_count} erreurs sur {synced_count} enregistrements",
+                        'status': 'circuit_breaker'
+                    })
+                    break
+        
+        if skipped_count:
+            logger.warning(f"{skipped_count} enregistrements ignorés (numéro de dossier invalide ou absent de la démarche)")
+        if read_error is not None:
+            raise read_error
+        return processed_count
+    
+    def _record_sync_result(self, grist_record: Dict, sync_result: Dict[str, Any], status_writer: Optional[BackgroundStatusWriter],
+                            results: List[Dict], error_details: List[Dict]):
+        """Range le résultat d'un enregistrement et met son statut en file pour Grist"""
+        if sync_result['status'] == 'success':
+            results.append(sync_result)
+        else:
+            error_details.append(sync_result)
+        
+        # Mettre à jour le statut dans Grist si configuré
+        if status_writer is not None:
+            success_status = sync_result['status'] == 'success'
+            message = f"Synchronized {len(sync_result['updates'])} annotations" if success_status else f"Errors: {len(sync_result['errors'])}"
+            
+            # Utiliser le hash des données pour la détection des changements
+            data_hash = grist_record.get('_current_hash')
+            
+            status_writer.put(grist_record['id'], success_status, message, data_hash=data_hash)
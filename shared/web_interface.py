@@ -5,29 +5,99 @@ Version finale avec persistance et détection des modifications
 """
 
 from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, session
+from flask.json.provider import JSONProvider
 import requests
-import json
 import logging
+import logging.handlers
+import atexit
+import functools
+import hashlib
+import json
 import os
+import queue
+import tempfile
+import threading
+import time
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from decimal import Decimal
 from pathlib import Path
 
 from sync_engine import SyncEngine, SyncConfig
 from grist_client import GristClient
 from ds_client import DSClient
 
-# Configuration du logging
-logging.basicConfig(level=logging.INFO)
+# Configuration du logging : les requêtes déposent les messages dans une file,
+# un thread dédié se charge de l'écriture sur stderr
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+class OrJSONProvider(JSONProvider):
+    """Sérialisation JSON de Flask (jsonify, request.get_json) via orjson
+    
+    sort_keys et compact ont le même sens que pour le fournisseur par défaut de Flask.
+    """
+    sort_keys = False
+    compact = True
+    
+    @property
+    def option(self) -> int:
+        # Les datetime naïfs (heure locale) sont sérialisés tels quels, sans être étiquetés UTC
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if not self.compact:
+            option |= orjson.OPT_INDENT_2
+        return option
+    
+    @staticmethod
+    def _default(obj):
+        """Types non gérés nativement par orjson (dates, UUID et dataclasses le sont)"""
+        if isinstance(obj, Decimal):
+            return str(obj)
+        if hasattr(obj, '__html__'):
+            return str(obj.__html__())
+        raise TypeError(f"Type {type(obj).__name__} non sérialisable en JSON")
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self._default, option=self.option).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        # orjson n'a pas d'object_hook : la session Flask (TaggedJSONSerializer) en a besoin
+        # pour reconstruire tuples, bytes, etc. Dans ce cas, passer par le json standard
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Réponse construite directement depuis les bytes produits par orjson
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=self._default, option=self.option), mimetype="application/json")
+
 app = Flask(__name__)
+app.json = OrJSONProvider(app)
+# Pas de tri des clés ni d'indentation : réponses produites en une passe, sans espaces superflus
+app.json.sort_keys = False
+app.json.compact = True
 app.secret_key = 'your-secret-key-change-this'
 
 # Fichier de configuration persistante
 CONFIG_FILE = 'app_config.json'
 
+# Dernier contenu lu du fichier de configuration, et son mtime : relu seulement s'il a changé
+_config_mtime = None
+_config_cache = {}
+# Empreinte du contenu actuellement sur disque, pour ne pas réécrire une configuration inchangée
+_last_config_hash = None
+
 def load_persistent_config():
     """Charge la configuration depuis le fichier"""
+    global _config_mtime, _config_cache, _last_config_hash
     default_config = {
         'ds_token': '',
         'instructeur_id': '',
@@ -39,24 +109,159 @@ def load_persistent_config():
     
     if os.path.exists(CONFIG_FILE):
         try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                saved_config = json.load(f)
-                default_config.update(saved_config)
+            mtime = os.stat(CONFIG_FILE).st_mtime_ns
+            if mtime != _config_mtime:
+                raw = Path(CONFIG_FILE).read_bytes()
+                _config_cache = orjson.loads(raw)
+                _config_mtime = mtime
+                _last_config_hash = hashlib.blake2b(raw, digest_size=16).digest()
+            default_config.update(_config_cache)
         except Exception as e:
             logger.error(f"Erreur chargement config: {e}")
+    else:
+        _config_mtime = None
+        _last_config_hash = None
     
     return default_config
 
 def save_persistent_config(config):
     """Sauvegarde la configuration dans le fichier"""
+    global _config_mtime, _config_cache, _last_config_hash
+    tmp_path = None
     try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        data = orjson.dumps(config, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        
+        # Contenu identique à celui du fichier, qui n'a pas été modifié depuis : rien à écrire
+        if digest == _last_config_hash and _config_mtime is not None:
+            try:
+                if os.stat(CONFIG_FILE).st_mtime_ns == _config_mtime:
+                    return
+            except FileNotFoundError:
+                pass
+        
+        # Écriture dans un fichier temporaire du même dossier puis renommage atomique :
+        # le fichier de configuration n'est jamais laissé à moitié écrit
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(CONFIG_FILE)), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, CONFIG_FILE)
+        tmp_path = None
+        
+        _last_config_hash = digest
+        _config_cache = orjson.loads(data)
+        _config_mtime = os.stat(CONFIG_FILE).st_mtime_ns
     except Exception as e:
         logger.error(f"Erreur sauvegarde config: {e}")
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 # Configuration globale avec persistance
 config = load_persistent_config()
+# Sérialise les modifications de la configuration (serveur WSGI multi-threads)
+_config_lock = threading.Lock()
+
+# Clients réutilisés d'une requête à l'autre (sessions keep-alive vers Grist et DS)
+_grist_client_cache = {}  # (base_url, token, doc_id) → GristClient
+_ds_client_cache = {}  # (token, instructeur_id) → DSClient
+_client_cache_lock = threading.Lock()
+
+def get_grist() -> GristClient:
+    """Client Grist de la configuration courante, créé au premier usage"""
+    key = (config['grist_base_url'], config['grist_token'], config['grist_doc_id'])
+    with _client_cache_lock:
+        client = _grist_client_cache.get(key)
+        if client is None:
+            client = _grist_client_cache[key] = GristClient(*key)
+    return client
+
+def get_ds() -> DSClient:
+    """Client DS de la configuration courante, créé au premier usage"""
+    key = (config['ds_token'], config.get('instructeur_id', ''))
+    with _client_cache_lock:
+        client = _ds_client_cache.get(key)
+        if client is None:
+            client = _ds_client_cache[key] = DSClient(*key)
+    return client
+
+def clear_clients():
+    """Oublie les clients en cache (à appeler quand la configuration change)
+    
+    Les anciens clients ne sont pas fermés : des requêtes en cours peuvent encore s'en servir.
+    Ils sont libérés (avec leurs connexions) quand plus rien ne les référence.
+    """
+    with _client_cache_lock:
+        _grist_client_cache.clear()
+        _ds_client_cache.clear()
+
+# Cache des colonnes et échantillons Grist demandés par l'interface : durée de vie de
+# _GRIST_CACHE_TTL secondes, invalidé en incrémentant _grist_cache_generation
+_GRIST_CACHE_TTL = 30
+_grist_cache_generation = 0
+
+# Types de colonnes Grist proposés dans le mapping
+_SUPPORTED_COL_TYPES = frozenset(('Text', 'Date', 'DateTime', 'Numeric', 'Int', 'Choice', 'Bool'))
+
+class _GristRequestError(Exception):
+    """Échec d'un appel Grist (levé pour ne pas être mis en cache par lru_cache)"""
+
+def _grist_cache_epoch() -> int:
+    return int(time.monotonic() // _GRIST_CACHE_TTL)
+
+def invalidate_grist_cache():
+    """Oublie les colonnes et échantillons Grist en cache (à appeler quand la configuration change)"""
+    global _grist_cache_generation
+    _grist_cache_generation += 1
+
+@functools.lru_cache(maxsize=64)
+def _grist_columns_cached(doc_id, table_id, epoch, generation):
+    """Colonnes supportées d'une table Grist, au format attendu par l'interface"""
+    grist_client = get_grist()
+    # Le client est partagé entre requêtes : relire le schéma, qui a pu changer dans Grist
+    grist_client.invalidate_columns(table_id)
+    success, data = grist_client.get_table_columns(table_id)
+    if not success:
+        raise _GristRequestError(data)
+    
+    # Filtrer et valider les colonnes
+    filtered_columns = []
+    
+    for col in data['columns']:
+        try:
+            col_id = col.get('id', 'Unknown')
+            fields = col.get('fields')
+            
+            if fields and 'type' in fields:
+                col_type = fields['type']
+                col_label = fields.get('label', col_id)
+            else:
+                col_type = col.get('type', 'Text')
+                col_label = col.get('label', col_id)
+            
+            clean_col = {
+                'id': col_id,
+                'type': col_type,
+                'label': col_label
+            }
+            
+            # Filtrer seulement les types supportés
+            if col_type in _SUPPORTED_COL_TYPES:
+                filtered_columns.append(clean_col)
+                
+        except Exception as e:
+            logger.error(f"Erreur traitement colonne {col}: {e}")
+            continue
+    
+    return filtered_columns
+
+@functools.lru_cache(maxsize=64)
+def _grist_sample_cached(doc_id, table_id, limit, epoch, generation):
+    """Premiers enregistrements d'une table Grist"""
+    success, data = get_grist().get_table_data(table_id, limit=limit)
+    if not success:
+        raise _GristRequestError(data)
+    return data['records']
 
 @app.route('/')
 def index():
@@ -65,18 +270,21 @@ def index():
 @app.route('/configure', methods=['POST'])
 def configure():
     """Configure les tokens et identifiants avec sauvegarde persistante"""
-    config['ds_token'] = request.form.get('ds_token', '').strip()
-    config['instructeur_id'] = request.form.get('instructeur_id', '').strip()
-    config['grist_token'] = request.form.get('grist_token', '').strip()
-    config['grist_doc_id'] = request.form.get('grist_doc_id', '').strip()
-    config['demarche_number'] = request.form.get('demarche_number', '').strip()
-    
-    if not all([config['ds_token'], config['instructeur_id'], config['grist_token'], config['grist_doc_id']]):
-        flash('Les champs DS Token, Instructeur ID, Grist Token et Doc ID sont requis', 'error')
-        return redirect(url_for('index'))
-    
-    # Sauvegarder de façon persistante
-    save_persistent_config(config)
+    with _config_lock:
+        config['ds_token'] = request.form.get('ds_token', '').strip()
+        config['instructeur_id'] = request.form.get('instructeur_id', '').strip()
+        config['grist_token'] = request.form.get('grist_token', '').strip()
+        config['grist_doc_id'] = request.form.get('grist_doc_id', '').strip()
+        config['demarche_number'] = request.form.get('demarche_number', '').strip()
+        
+        if not all([config['ds_token'], config['instructeur_id'], config['grist_token'], config['grist_doc_id']]):
+            flash('Les champs DS Token, Instructeur ID, Grist Token et Doc ID sont requis', 'error')
+            return redirect(url_for('index'))
+        
+        # Sauvegarder de façon persistante
+        save_persistent_config(config)
+        clear_clients()
+        invalidate_grist_cache()
     
     # Sauvegarder en session aussi
     session.update(config)
@@ -92,27 +300,29 @@ def test_connections():
     
     results = {}
     
-    # Test Grist
-    grist_client = GristClient(config['grist_base_url'], config['grist_token'], config['grist_doc_id'])
-    grist_success, grist_data = grist_client.test_connection()
-    results['grist'] = {
-        'success': grist_success,
-        'data': grist_data
-    }
-    
-    # Test DS seulement si le token est configuré
-    if config['ds_token']:
-        ds_client = DSClient(config['ds_token'], config['instructeur_id'])
-        ds_success, ds_data = ds_client.test_connection()
-        results['ds'] = {
-            'success': ds_success,
-            'data': ds_data
-        }
-    else:
-        results['ds'] = {
-            'success': False,
-            'data': 'Token DS non configuré'
+    # Tests Grist et DS indépendants : lancés en parallèle
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        grist_future = executor.submit(get_grist().test_connection)
+        # Test DS seulement si le token est configuré
+        ds_future = executor.submit(get_ds().test_connection) if config['ds_token'] else None
+        
+        grist_success, grist_data = grist_future.result()
+        results['grist'] = {
+            'success': grist_success,
+            'data': grist_data
         }
+        
+        if ds_future is not None:
+            ds_success, ds_data = ds_future.result()
+            results['ds'] = {
+                'success': ds_success,
+                'data': ds_data
+            }
+        else:
+            results['ds'] = {
+                'success': False,
+                'data': 'Token DS non configuré'
+            }
     
     return jsonify(results)
 
@@ -123,7 +333,7 @@ def get_grist_tables():
         return jsonify({'error': 'Configuration Grist incomplète'}), 400
     
     try:
-        grist_client = GristClient(config['grist_base_url'], config['grist_token'], config['grist_doc_id'])
+        grist_client = get_grist()
         success, data = grist_client.get_tables()
         
         if success:
@@ -142,42 +352,11 @@ def get_table_columns(table_id):
         return jsonify({'error': 'Configuration Grist incomplète'}), 400
     
     try:
-        grist_client = GristClient(config['grist_base_url'], config['grist_token'], config['grist_doc_id'])
-        success, data = grist_client.get_table_columns(table_id)
-        
-        if success:
-            # Filtrer et valider les colonnes
-            filtered_columns = []
-            
-            for col in data['columns']:
-                try:
-                    col_id = col.get('id', 'Unknown')
-                    
-                    if 'fields' in col and 'type' in col['fields']:
-                        col_type = col['fields']['type']
-                        col_label = col['fields'].get('label', col_id)
-                    else:
-                        col_type = col.get('type', 'Text')
-                        col_label = col.get('label', col_id)
-                    
-                    clean_col = {
-                        'id': col_id,
-                        'type': col_type,
-                        'label': col_label
-                    }
-                    
-                    # Filtrer seulement les types supportés
-                    if col_type in ['Text', 'Date', 'DateTime', 'Numeric', 'Int', 'Choice', 'Bool']:
-                        filtered_columns.append(clean_col)
-                        
-                except Exception as e:
-                    logger.error(f"Erreur traitement colonne {col}: {e}")
-                    continue
-            
-            return jsonify({'success': True, 'columns': filtered_columns})
-        else:
-            logger.error(f"Erreur Grist get_table_columns: {data}")
-            return jsonify({'success': False, 'error': str(data)}), 500
+        columns = _grist_columns_cached(config['grist_doc_id'], table_id, _grist_cache_epoch(), _grist_cache_generation)
+        return jsonify({'success': True, 'columns': columns})
+    except _GristRequestError as e:
+        logger.error(f"Erreur Grist get_table_columns: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
     except Exception as e:
         logger.error(f"Exception get_table_columns: {e}")
         return jsonify({'success': False, 'error': f'Erreur serveur: {str(e)}'}), 500
@@ -190,14 +369,11 @@ def get_table_data(table_id):
     
     try:
         limit = request.args.get('limit', 5, type=int)
-        grist_client = GristClient(config['grist_base_url'], config['grist_token'], config['grist_doc_id'])
-        success, data = grist_client.get_table_data(table_id, limit=limit)
-        
-        if success:
-            return jsonify({'success': True, 'records': data['records']})
-        else:
-            logger.error(f"Erreur Grist get_table_data: {data}")
-            return jsonify({'success': False, 'error': str(data)}), 500
+        records = _grist_sample_cached(config['grist_doc_id'], table_id, limit, _grist_cache_epoch(), _grist_cache_generation)
+        return jsonify({'success': True, 'records': records})
+    except _GristRequestError as e:
+        logger.error(f"Erreur Grist get_table_data: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
     except Exception as e:
         logger.error(f"Exception get_table_data: {e}")
         return jsonify({'success': False, 'error': f'Erreur serveur: {str(e)}'}), 500
@@ -209,29 +385,21 @@ def get_instructeurs():
         return jsonify({'error': 'Configuration DS incomplète (token et numéro de démarche requis)'}), 400
 
     try:
-        logger.info(f"Début get_instructeurs - Démarche: {config['demarche_number']}")
+        logger.info("Début get_instructeurs - Démarche: %s", config['demarche_number'])
 
-        ds_client = DSClient(config['ds_token'], config.get('instructeur_id', ''))
+        ds_client = get_ds()
 
-        # Test de connexion d'abord
-        conn_success, conn_data = ds_client.test_connection()
-        if not conn_success:
-            logger.error(f"Connexion DS échouée: {conn_data}")
-            return jsonify({'success': False, 'error': f'Connexion DS échouée: {conn_data}'}), 500
-
-        logger.info("Connexion DS OK, récupération des instructeurs...")
-
-        # Récupérer les instructeurs
+        # Récupérer les instructeurs (une erreur de connexion DS remonte directement de cet appel)
         success, instructeurs_data = ds_client.get_instructeurs(int(config['demarche_number']))
         if not success:
-            logger.error(f"Erreur get_instructeurs: {instructeurs_data}")
+            logger.error("Erreur get_instructeurs: %s", instructeurs_data)
             return jsonify({'success': False, 'error': f'Erreur récupération instructeurs: {instructeurs_data}'}), 500
 
         if not instructeurs_data:
             logger.warning("Aucun instructeur trouvé")
             return jsonify({'success': False, 'error': 'Aucun instructeur trouvé dans cette démarche'}), 400
 
-        logger.info(f"Instructeurs trouvés: {len(instructeurs_data)}")
+        logger.info("Instructeurs trouvés: %d", len(instructeurs_data))
 
         return jsonify({
             'success': True,
@@ -240,9 +408,7 @@ def get_instructeurs():
         })
 
     except Exception as e:
-        logger.error(f"Exception globale get_instructeurs: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Exception globale get_instructeurs: %s", e)
         return jsonify({'success': False, 'error': f'Erreur serveur: {str(e)}'}), 500
 
 @app.route('/get_sample_annotations')
@@ -252,81 +418,86 @@ def get_sample_annotations():
         return jsonify({'error': 'Configuration DS incomplète'}), 400
     
     try:
-        logger.info(f"Début get_sample_annotations - Démarche: {config['demarche_number']}")
-        
-        ds_client = DSClient(config['ds_token'], config['instructeur_id'])
+        logger.info("Début get_sample_annotations - Démarche: %s", config['demarche_number'])
         
-        # Test de connexion d'abord
-        conn_success, conn_data = ds_client.test_connection()
-        if not conn_success:
-            logger.error(f"Connexion DS échouée: {conn_data}")
-            return jsonify({'success': False, 'error': f'Connexion DS échouée: {conn_data}'}), 500
-        
-        logger.info("Connexion DS OK, récupération des dossiers...")
+        ds_client = get_ds()
+        # Client partagé et durable : ne pas accumuler les valeurs d'annotations des échantillons successifs
+        ds_client.clear_current_values()
         
         # Récupérer quelques dossiers pour trouver un échantillon avec des annotations
+        # (une erreur de connexion DS remonte directement de cet appel)
         success, dossiers_data = ds_client.get_dossiers(int(config['demarche_number']), limit=10)
         if not success:
-            logger.error(f"Erreur get_dossiers: {dossiers_data}")
+            logger.error("Erreur get_dossiers: %s", dossiers_data)
             return jsonify({'success': False, 'error': f'Erreur récupération dossiers: {dossiers_data}'}), 500
         
         if not dossiers_data:
             logger.warning("Aucun dossier trouvé")
             return jsonify({'success': False, 'error': 'Aucun dossier trouvé dans cette démarche'}), 400
         
-        logger.info(f"Dossiers trouvés: {len(dossiers_data)}")
+        logger.info("Dossiers trouvés: %d", len(dossiers_data))
         
         # Essayer de récupérer les annotations du premier dossier avec des annotations
         sample_annotations = []
         used_dossier_number = None
         errors_log = []
         
-        for i, dossier in enumerate(dossiers_data[:5]):  # Tester jusqu'à 5 dossiers
-            dossier_num = dossier['number']
-            logger.info(f"Test dossier {i+1}/5: #{dossier_num}")
+        # Interroger jusqu'à 5 dossiers en parallèle, puis retenir le premier (dans l'ordre) qui a des annotations
+        dossier_numbers = [dossier['number'] for dossier in dossiers_data[:5]]
+        executor = ThreadPoolExecutor(max_workers=len(dossier_numbers))
+        try:
+            futures = [executor.submit(ds_client.get_dossier_annotations, dossier_num) for dossier_num in dossier_numbers]
             
-            try:
-                success, annotations = ds_client.get_dossier_annotations(dossier_num)
-                if success and annotations and len(annotations) > 0:
-                    sample_annotations = annotations
-                    used_dossier_number = dossier_num
-                    logger.info(f"✅ Annotations trouvées dans le dossier {dossier_num}: {len(annotations)} annotations")
-                    break
-                else:
-                    if success:
-                        logger.info(f"⚠️ Dossier {dossier_num}: {len(annotations) if annotations else 0} annotations")
+            for i, (dossier_num, future) in enumerate(zip(dossier_numbers, futures)):
+                logger.info("Test dossier %d/5: #%s", i + 1, dossier_num)
+                
+                try:
+                    success, annotations = future.result()
+                    if success and annotations and len(annotations) > 0:
+                        sample_annotations = annotations
+                        used_dossier_number = dossier_num
+                        logger.info("✅ Annotations trouvées dans le dossier %s: %d annotations", dossier_num, len(annotations))
+                        break
                     else:
-                        logger.warning(f"❌ Dossier {dossier_num}: Erreur - {annotations}")
-                        errors_log.append(f"Dossier {dossier_num}: {annotations}")
-            except Exception as e:
-                logger.error(f"💥 Exception dossier {dossier_num}: {e}")
-                errors_log.append(f"Dossier {dossier_num}: Exception - {str(e)}")
-                continue
+                        if success:
+                            logger.info("⚠️ Dossier %s: %d annotations", dossier_num, len(annotations) if annotations else 0)
+                        else:
+                            logger.warning("❌ Dossier %s: Erreur - %s", dossier_num, annotations)
+                            errors_log.append(f"Dossier {dossier_num}: {annotations}")
+                except Exception as e:
+                    logger.error("💥 Exception dossier %s: %s", dossier_num, e)
+                    errors_log.append(f"Dossier {dossier_num}: Exception - {str(e)}")
+                    continue
+        finally:
+            # Ne pas attendre les dossiers devenus inutiles
+            executor.shutdown(wait=False, cancel_futures=True)
         
         if not sample_annotations:
             error_msg = f'Aucune annotation trouvée dans les dossiers échantillons. Erreurs: {"; ".join(errors_log[:3])}'
             logger.error(error_msg)
             return jsonify({'success': False, 'error': error_msg}), 400
         
-        logger.info(f"Traitement de {len(sample_annotations)} annotations")
+        logger.info("Traitement de %d annotations", len(sample_annotations))
+        
+        # Extraire les informations des annotations (celles sans id ou libellé sont ignorées)
+        annotation_labels = [
+            {
+                'id': annotation['id'],
+                'label': annotation['label'],
+                'current_value': annotation.get('stringValue', ''),
+                'champDescriptorId': annotation.get('champDescriptorId', ''),
+                'ds_type': annotation.get('ds_type', 'text'),
+                '__typename': annotation.get('__typename', 'Unknown')
+            }
+            for annotation in sample_annotations
+            if 'id' in annotation and 'label' in annotation
+        ]
         
-        # Extraire les informations des annotations
-        annotation_labels = []
-        for annotation in sample_annotations:
-            try:
-                annotation_labels.append({
-                    'id': annotation['id'],
-                    'label': annotation['label'],
-                    'current_value': annotation.get('stringValue', ''),
-                    'champDescriptorId': annotation.get('champDescriptorId', ''),
-                    'ds_type': annotation.get('ds_type', 'text'),
-                    '__typename': annotation.get('__typename', 'Unknown')
-                })
-            except Exception as e:
-                logger.error(f"Erreur traitement annotation {annotation}: {e}")
-                continue
-        
-        logger.info(f"Retour de {len(annotation_labels)} annotations traitées")
+        dropped = len(sample_annotations) - len(annotation_labels)
+        if dropped:
+            logger.error("%d annotation(s) sans id ou libellé ignorée(s)", dropped)
+        
+        logger.info("Retour de %d annotations traitées", len(annotation_labels))
         
         return jsonify({
             'success': True,
@@ -341,9 +512,7 @@ def get_sample_annotations():
         })
         
     except Exception as e:
-        logger.error(f"💥 Exception globale get_sample_annotations: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("💥 Exception globale get_sample_annotations: %s", e)
         return jsonify({'success': False, 'error': f'Erreur serveur: {str(e)}'}), 500
 
 @app.route('/execute_sync', methods=['POST'])
@@ -371,79 +540,81 @@ def execute_sync():
         )
         
         # Créer et exécuter le moteur de synchronisation
-        sync_engine = SyncEngine(sync_config)
-        result = sync_engine.execute_sync()
+        with SyncEngine(sync_config) as sync_engine:
+            result = sync_engine.execute_sync()
         
-        # Convertir le résultat en format JSON
-        return jsonify({
-            'success': result.success,
-            'processed': result.processed,
-            'successful': result.successful,
-            'errors': result.errors,
-            'results': result.results,
-            'error_details': result.error_details,
-            'execution_time': result.execution_time
-        })
+        # SyncResult est une dataclass : orjson la sérialise directement, champ par champ,
+        # sans dictionnaire intermédiaire
+        return jsonify(result)
         
     except Exception as e:
         logger.error(f"Erreur synchronisation: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _check_column_compatibility(ds_client, sample_values, grist_col, annotation_label, grist_type, ds_type):
+    """Compatibilité d'une colonne Grist avec une annotation DS, évaluée sur des valeurs échantillon"""
+    # Compatibilité globale : la pire des valeurs, arrêt dès la première incompatible
+    overall_compatibility = 'compatible'
+    for value in sample_values:
+        if value is None or value == '':
+            continue
+        compatibility = ds_client.check_compatibility(grist_type, ds_type, value)
+        if compatibility == 'incompatible':
+            overall_compatibility = 'incompatible'
+            break
+        if compatibility == 'needs_conversion':
+            overall_compatibility = 'needs_conversion'
+    
+    return {
+        'grist_column': grist_col,
+        'annotation_label': annotation_label,
+        'grist_type': grist_type,
+        'ds_type': ds_type,
+        'compatibility': overall_compatibility,
+        'sample_values': sample_values[:3]
+    }
+
 @app.route('/validate_compatibility', methods=['POST'])
 def validate_compatibility():
     """Valide la compatibilité des données avant synchronisation"""
     try:
         data = request.get_json()
         
-        # Créer un client DS temporaire pour les vérifications
-        ds_client = DSClient(config['ds_token'], config['instructeur_id'])
-        grist_client = GristClient(config['grist_base_url'], config['grist_token'], config['grist_doc_id'])
+        table_id = data.get('table_id')
+        annotation_types = data.get('annotation_types', {})
+        
+        # Clients partagés pour les vérifications
+        ds_client = get_ds()
+        grist_client = get_grist()
+        grist_client.invalidate_columns(table_id)
         
-        # Récupérer quelques échantillons de données
-        success, sample_data = grist_client.get_table_data(data.get('table_id'), limit=5)
+        # Échantillons de données et types de toutes les colonnes : deux appels indépendants, en parallèle
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            sample_future = executor.submit(grist_client.get_table_data, table_id, limit=5)
+            schema_future = executor.submit(grist_client.get_columns_schema, table_id)
+            success, sample_data = sample_future.result()
+            column_types = schema_future.result()
         if not success:
             return jsonify({'success': False, 'error': f'Erreur récupération données: {sample_data}'}), 500
         
-        compatibility_results = []
-        
-        for grist_col, annotation_label in data.get('column_mapping', {}).items():
-            # Récupérer le type de la colonne Grist
-            grist_type = grist_client.get_column_type(data.get('table_id'), grist_col)
-            
-            # Récupérer le type de l'annotation DS depuis annotation_types passé en paramètre
-            ds_type = data.get('annotation_types', {}).get(annotation_label, 'text')
-            
-            # Tester avec des valeurs échantillon
-            sample_values = []
-            for record in sample_data['records']:
-                if grist_col in record['fields']:
-                    sample_values.append(record['fields'][grist_col])
-            
-            # Vérifier la compatibilité
-            compatibilities = []
-            for value in sample_values:
-                if value is not None and value != '':
-                    compatibility = ds_client.check_compatibility(grist_type, ds_type, value)
-                    compatibilities.append(compatibility)
-            
-            # Déterminer la compatibilité globale
-            if not compatibilities:
-                overall_compatibility = 'compatible'
-            elif 'incompatible' in compatibilities:
-                overall_compatibility = 'incompatible'
-            elif 'needs_conversion' in compatibilities:
-                overall_compatibility = 'needs_conversion'
-            else:
-                overall_compatibility = 'compatible'
-            
-            compatibility_results.append({
-                'grist_column': grist_col,
-                'annotation_label': annotation_label,
-                'grist_type': grist_type,
-                'ds_type': ds_type,
-                'compatibility': overall_compatibility,
-                'sample_values': sample_values[:3]
-            })
+        # Valeurs échantillon regroupées par colonne, en un seul parcours des enregistrements
+        values_by_column = {}
+        for record in sample_data['records']:
+            for col_id, value in record['fields'].items():
+                values_by_column.setdefault(col_id, []).append(value)
+        
+        compatibility_results = [
+            _check_column_compatibility(
+                ds_client,
+                values_by_column.get(grist_col, []),
+                grist_col,
+                annotation_label,
+                column_types.get(grist_col, 'Text'),
+                # Type de l'annotation DS depuis annotation_types passé en paramètre
+                annotation_types.get(annotation_label, 'text')
+            )
+            for grist_col, annotation_label in data.get('column_mapping', {}).items()
+        ]
         
         return jsonify({
             'success': True,
@@ -502,12 +673,15 @@ def sync_page():
 def clear_config():
     """Efface la configuration sauvegardée"""
     try:
-        if os.path.exists(CONFIG_FILE):
-            os.remove(CONFIG_FILE)
-        
-        # Réinitialiser la config en mémoire
         global config
-        config = load_persistent_config()
+        with _config_lock:
+            if os.path.exists(CONFIG_FILE):
+                os.remove(CONFIG_FILE)
+            
+            # Réinitialiser la config en mémoire
+            config = load_persistent_config()
+            clear_clients()
+            invalidate_grist_cache()
         
         flash('Configuration effacée avec succès', 'success')
         return jsonify({'success': True})
@@ -515,10 +689,14 @@ def clear_config():
         logger.error(f"Erreur effacement config: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# En production, servir l'application avec gunicorn (depuis le dossier shared) :
+#   gunicorn -w 1 -k gthread --threads 8 -b 0.0.0.0:5000 web_interface:app
+# Un seul processus : la configuration et les caches sont en mémoire, les threads
+# suffisent pour que les requêtes lentes (DS, Grist) ne bloquent pas les autres.
 if __name__ == '__main__':
     print(f"Configuration chargée depuis: {os.path.abspath(CONFIG_FILE)}")
     print("Nouvelles fonctionnalités:")
     print("- Configuration persistante automatique")
     print("- Détection automatique des modifications des données")
     print("- Colonne sync_hash pour optimiser les synchronisations") 
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file